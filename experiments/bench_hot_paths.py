@@ -0,0 +1,251 @@
+"""
+Micro-benchmarks for the parser, premise selector, problem builder and metrics hot paths,
+checked against the baselines in experiments/bench_baselines.json.
+
+Everything runs offline on synthetic inputs written to a temporary directory. Each case reports
+the best of --repeat runs; a case slower than --threshold times its baseline is a regression and
+makes the run exit with status 1. Baselines are machine-specific: refresh them with --update
+on the machine that runs the comparison.
+
+Usage: python -m experiments.bench_hot_paths [--repeat R] [--threshold T] [--only SUBSTR] [--update]
+                                             [--skip-large]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import src.metrics as metrics
+from experiments.bench_tptp_lexer import synthetic_axiom_file
+from src import tptp_parser
+from src.premise_selector import PremiseSelector
+from src.tptp_builder import build_tptp_problem, determine_typed
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baselines.json")
+# A case this many times slower than its baseline is reported as a regression. Best-of-N timings
+# on a busy machine still drift by up to ~1.5x, so anything tighter flags noise.
+REGRESSION_THRESHOLD = 1.75
+REPEAT = 5
+SEED = 0
+
+SELECTOR_SIZES = [100, 10_000, 100_000]
+# Cases at or above this many axioms are skipped by --skip-large.
+LARGE_SIZE = 100_000
+INCLUDE_DEPTH = 20
+# The small problem parses in well under a millisecond, so it is timed this many times per run.
+SMALL_PARSES = 100
+BUILDER_AXIOMS = 20_000
+RANKINGS = 2_000
+RANKING_LENGTH = 1_000
+POSITIVES = 20
+METRIC_KS = [1, 8, 16, 32, 64, 128, 256]
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def _write(path: str, content: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def _fof_axioms(rng: random.Random, count: int, prefix: str = "ax") -> List[str]:
+    """One-line fof axioms over a shared vocabulary, so TF-IDF has overlapping terms to weigh."""
+    lines = []
+    for idx in range(count):
+        pred, func = f"p{rng.randrange(2000)}", f"f{rng.randrange(500)}"
+        lines.append(f"fof({prefix}{idx}, axiom, ( ! [X, Y] : ( ( {pred}(X) & q{idx % 97}({func}(X), Y) ) "
+                     f"=> ? [Z] : {pred}({func}(Y, Z)) ) )).")
+    return lines
+
+
+def parser_cases(tmp_dir: str) -> List[Case]:
+    rng = random.Random(SEED)
+    small = _write(os.path.join(tmp_dir, "Problems", "SYN", "SYN001+1.p"),
+                   "\n".join(_fof_axioms(rng, 20) + ["fof(goal, conjecture, ? [X] : p1(X))."]) + "\n")
+    large = _write(os.path.join(tmp_dir, "Problems", "SYN", "SYN002+1.p"), synthetic_axiom_file(20_000, SEED))
+
+    # A chain of axiom files, each including the next one, some through a selection list.
+    for level in range(INCLUDE_DEPTH):
+        lines = []
+        if level + 1 < INCLUDE_DEPTH:
+            selection = f",[l{level + 1}_ax0,l{level + 1}_ax1]" if level % 5 == 4 else ""
+            lines.append(f"include('Axioms/SYN/level{level + 1}.ax'{selection}).")
+        lines += _fof_axioms(rng, 200, prefix=f"l{level}_ax")
+        _write(os.path.join(tmp_dir, "Axioms", "SYN", f"level{level}.ax"), "\n".join(lines) + "\n")
+    deep = _write(os.path.join(tmp_dir, "Problems", "SYN", "SYN003+1.p"),
+                  "include('Axioms/SYN/level0.ax').\nfof(goal, conjecture, ? [X] : p1(X)).\n")
+
+    def parse(path: str, number: int = 1) -> Callable[[], object]:
+        def run():
+            for _ in range(number):
+                # Time the cold path: a warm include cache would skip the parsing being measured.
+                tptp_parser.clear_include_cache()
+                tptp_parser.parse_tptp_file(path, tmp_dir)
+        return run
+
+    with open(large, "r", encoding="utf-8") as f:
+        raw = f.read()
+    masked = tptp_parser.mask_comments(raw)
+
+    def extract():
+        return [tptp_parser.extract_tptp_components(m, masked) for m in tptp_parser.TPTP_HEADER_RE.finditer(masked)]
+
+    return [
+        (f"parse_tptp_file/small_x{SMALL_PARSES}", parse(small, SMALL_PARSES)),
+        ("parse_tptp_file/large", parse(large)),
+        (f"parse_tptp_file/include_depth_{INCLUDE_DEPTH}", parse(deep)),
+        ("mask_comments/large", lambda: tptp_parser.mask_comments(raw)),
+        ("extract_tptp_components/large", extract),
+    ]
+
+
+def selector_cases(tmp_dir: str, sizes: List[int]) -> List[Case]:
+    cases: List[Case] = []
+    for size in sizes:
+        rng = random.Random(SEED)
+        path = _write(os.path.join(tmp_dir, "Selector", f"SEL{size}.p"),
+                      "\n".join(_fof_axioms(rng, size) + ["fof(goal, conjecture, ? [X] : ( p1(X) & q3(f7(X), X) ))."]) + "\n")
+        parsed = PremiseSelector(path)
+        parsed.doc_parse()
+
+        def tfidf(selector: PremiseSelector = parsed):
+            selector.scores, selector.order = [], []
+            selector.tfidf()
+
+        def select(path: str = path):
+            # A fresh selector, so this is the whole call: parse, fit, rank and print the top k.
+            with contextlib.redirect_stdout(io.StringIO()):
+                return PremiseSelector(path).select_premises_tfidf(32)
+
+        cases.append((f"PremiseSelector.tfidf/{size}", tfidf))
+        cases.append((f"select_premises_tfidf/{size}", select))
+    return cases
+
+
+def builder_cases() -> List[Case]:
+    rng = random.Random(SEED)
+    axioms = []
+    for idx in range(BUILDER_AXIOMS):
+        if idx % 10 == 0:
+            axioms.append(f"t{idx}: ( $i * $i ) > $o")
+        else:
+            axioms.append(f"! [X, Y] : ( p{rng.randrange(2000)}(X) => q{idx % 97}(f{rng.randrange(500)}(X, Y)) )")
+    conjecture = "? [X] : p1(X)"
+    return [
+        (f"build_tptp_problem/{BUILDER_AXIOMS}", lambda: build_tptp_problem(conjecture, axioms, "bench")),
+        (f"determine_typed/{BUILDER_AXIOMS}", lambda: [determine_typed(axiom) for axiom in axioms]),
+    ]
+
+
+def metric_cases() -> List[Case]:
+    rng = random.Random(SEED)
+    pool = [f"ax{idx}" for idx in range(RANKING_LENGTH * 2)]
+    rankings = [rng.sample(pool, RANKING_LENGTH) for _ in range(RANKINGS)]
+    pos_sets = [set(rng.sample(pool, POSITIVES)) for _ in range(RANKINGS)]
+    pairs = list(zip(rankings, pos_sets))
+    relevance, num_pos = metrics.relevance_matrix(rankings, pos_sets)
+    per_problem = metrics.batch_metrics(relevance, num_pos, METRIC_KS)
+
+    def scalar():
+        return [[metrics.recall_at_k(r, p, k) for k in METRIC_KS] + [metrics.mrr(r, p)] +
+                [metrics.success_in_top_k(r, p, k) for k in METRIC_KS] for r, p in pairs]
+
+    return [
+        (f"metrics.per_problem/{RANKINGS}x{RANKING_LENGTH}", scalar),
+        (f"metrics.relevance_matrix/{RANKINGS}x{RANKING_LENGTH}", lambda: metrics.relevance_matrix(rankings, pos_sets)),
+        (f"metrics.batch_metrics/{RANKINGS}x{RANKING_LENGTH}", lambda: metrics.batch_metrics(relevance, num_pos, METRIC_KS)),
+        (f"metrics.summarize_bootstrap/{RANKINGS}", lambda: metrics.summarize(per_problem, bootstrap=1000)),
+    ]
+
+
+def time_best(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_baselines(path: str) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baselines(path: str, results: Dict[str, float], previous: Dict[str, float]) -> None:
+    # Cases that did not run this time (--only, --skip-large) keep their old baseline.
+    merged = {**previous, **results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "results": {name: round(seconds, 6) for name, seconds in sorted(merged.items())},
+        }, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the parser, selector, builder and metrics hot paths.")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Fail when a case takes more than this many times its baseline.")
+    parser.add_argument("--only", default=None, help="Only run cases whose name contains this string.")
+    parser.add_argument("--skip-large", action="store_true", help=f"Skip the {LARGE_SIZE}-axiom selector cases.")
+    parser.add_argument("--baselines", default=BASELINE_FILE)
+    parser.add_argument("--update", action="store_true", help="Write the timings as the new baselines.")
+    args = parser.parse_args()
+
+    sizes = [size for size in SELECTOR_SIZES if not (args.skip_large and size >= LARGE_SIZE)]
+    baselines = load_baselines(args.baselines)
+    results: Dict[str, float] = {}
+    regressions: List[str] = []
+
+    print(f"{'case':<42} {'best s':>9} {'baseline s':>11} {'ratio':>7}")
+    print("-" * 72)
+    with tempfile.TemporaryDirectory(prefix="bench_hot_paths_") as tmp_dir:
+        cases = parser_cases(tmp_dir) + selector_cases(tmp_dir, sizes) + builder_cases() + metric_cases()
+        for name, fn in cases:
+            if args.only and args.only not in name:
+                continue
+            fn()  # Warm-up: imports, regex compilation, first-touch allocations.
+            best = time_best(fn, args.repeat)
+            results[name] = best
+
+            baseline: Optional[float] = baselines.get(name)
+            if baseline is None:
+                print(f"{name:<42} {best:>9.4f} {'-':>11} {'-':>7}")
+                continue
+            ratio = best / max(baseline, 1e-9)
+            flag = ""
+            if ratio > args.threshold:
+                regressions.append(name)
+                flag = "  REGRESSION"
+            print(f"{name:<42} {best:>9.4f} {baseline:>11.4f} {ratio:>6.2f}x{flag}", flush=True)
+
+    if args.update:
+        save_baselines(args.baselines, results, baselines)
+        print(f"\nWrote {len(results)} baselines to {args.baselines}")
+        return
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than {args.threshold:.2f}x their baseline: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo regressions (threshold {args.threshold:.2f}x).")
+
+
+if __name__ == "__main__":
+    main()
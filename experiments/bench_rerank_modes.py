@@ -0,0 +1,78 @@
+"""
+Compare pointwise and listwise DeepSeekScorer reranking: tokens, requests and wall-time per problem.
+
+Needs a running Ollama server (see src/models/deepseek_math.py) and a corpus in the
+evaluate.py format. Both modes run without the score cache, so every candidate is really scored.
+
+Usage: python -m experiments.bench_rerank_modes CORPUS [--problems N] [--pool 100] [--group-size 10]
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+import src.metrics as metrics
+from src.jsonl_reader import JSONLDataset
+from src.models.deepseek_math import DeepSeekScorer, LISTWISE_GROUP_SIZE
+
+
+def run_mode(scorer: DeepSeekScorer, problems: List[Dict], k: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    recall = 0.0
+    for problem in problems:
+        ranked = scorer.rerank(problem["conjecture"], problem["candidates"])
+        recall += metrics.recall_at_k(ranked, set(problem["positives"]), k)
+    elapsed = time.perf_counter() - start
+
+    n = max(len(problems), 1)
+    return {
+        "requests/problem": scorer.usage["requests"] / n,
+        "prompt tokens/problem": scorer.usage["prompt_tokens"] / n,
+        "completion tokens/problem": scorer.usage["completion_tokens"] / n,
+        "seconds/problem": elapsed / n,
+        f"recall@{k}": recall / n,
+        "listwise fallbacks": scorer.usage["listwise_fallbacks"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pointwise vs listwise LLM reranking.")
+    parser.add_argument("corpus")
+    parser.add_argument("--problems", type=int, default=5)
+    parser.add_argument("--pool", type=int, default=100)
+    parser.add_argument("--group-size", type=int, default=LISTWISE_GROUP_SIZE)
+    parser.add_argument("--k", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    dataset = JSONLDataset(args.corpus)
+    indices = rng.sample(range(len(dataset)), min(args.problems, len(dataset)))
+
+    problems = []
+    for idx in indices:
+        data = dataset[idx]
+        positives = data.get("positives", [])
+        negatives = data.get("negatives", [])
+        if not data.get("conjecture") or not positives:
+            continue
+        sampled = rng.sample(negatives, min(len(negatives), max(args.pool - len(positives), 0)))
+        candidates = positives + sampled
+        rng.shuffle(candidates)
+        problems.append({"conjecture": data["conjecture"], "positives": positives, "candidates": candidates})
+    dataset.close()
+
+    results = {
+        "pointwise": run_mode(DeepSeekScorer(group_size=1), problems, args.k),
+        f"listwise({args.group_size})": run_mode(DeepSeekScorer(group_size=args.group_size), problems, args.k),
+    }
+
+    print(f"{len(problems)} problems, pool size {args.pool}")
+    metric_names = list(next(iter(results.values())).keys())
+    print(f"{'metric':<28}" + "".join(f"{mode:>16}" for mode in results))
+    for name in metric_names:
+        print(f"{name:<28}" + "".join(f"{results[mode][name]:>16.2f}" for mode in results))
+
+
+if __name__ == "__main__":
+    main()
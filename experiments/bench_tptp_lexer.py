@@ -0,0 +1,254 @@
+"""
+Benchmark the regex-driven TPTP lexer in src/tptp_parser.py against the original per-character
+implementation, on the largest Axioms/*.ax files of the TPTP library.
+
+Usage: python -m experiments.bench_tptp_lexer [--tptp-dir DIR] [--files N] [--repeat R]
+Without a TPTP library on disk a synthetic multi-megabyte axiom file is used instead.
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src import tptp_parser
+
+DEFAULT_TPTP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "TPTP-v9.2.1")
+
+
+def legacy_mask_comments(content: str) -> str:
+    """
+    The original per-character mask_comments, kept as the reference for correctness and speed.
+    """
+    chars = list(content)
+    index = 0
+    current_quote: Optional[str] = None
+    in_line_comment = False
+    in_block_comment = False
+    backslash_run = 0
+
+    while index < len(chars):
+        char = chars[index]
+        next_char = chars[index + 1] if index + 1 < len(chars) else ""
+        escaped = backslash_run % 2 == 1
+
+        if in_line_comment:
+            if char == "\n":
+                in_line_comment = False
+            else:
+                chars[index] = " "
+            backslash_run = 0
+            index += 1
+            continue
+
+        if in_block_comment:
+            if char == "*" and next_char == "/":
+                chars[index] = " "
+                chars[index + 1] = " "
+                in_block_comment = False
+                backslash_run = 0
+                index += 2
+                continue
+            if char != "\n":
+                chars[index] = " "
+            backslash_run = 0
+            index += 1
+            continue
+
+        if current_quote:
+            if char == current_quote and not escaped:
+                current_quote = None
+            backslash_run = backslash_run + 1 if char == "\\" else 0
+            index += 1
+            continue
+
+        if char in ("'", '"') and not escaped:
+            current_quote = char
+            backslash_run = 0
+            index += 1
+            continue
+
+        if char == "%":
+            chars[index] = " "
+            in_line_comment = True
+            backslash_run = 0
+            index += 1
+            continue
+
+        if char == "/" and next_char == "*":
+            chars[index] = " "
+            chars[index + 1] = " "
+            in_block_comment = True
+            backslash_run = 0
+            index += 2
+            continue
+
+        backslash_run = backslash_run + 1 if char == "\\" else 0
+        index += 1
+
+    return "".join(chars)
+
+
+def legacy_extract_tptp_components(match: re.Match, content: str) -> Dict[str, str]:
+    """
+    The original per-character extract_tptp_components, kept as the reference.
+    """
+    formula_start = match.end()
+    formula_end: Optional[int] = None
+    statement_close_idx: Optional[int] = None
+
+    open_parens = 0
+    open_square_brackets = 0
+    open_curly_braces = 0
+    current_quote: Optional[str] = None
+    backslash_run = 0
+
+    index = formula_start
+    while index < len(content):
+        char = content[index]
+        escaped = backslash_run % 2 == 1
+
+        if current_quote:
+            if char == current_quote and not escaped:
+                current_quote = None
+            backslash_run = backslash_run + 1 if char == "\\" else 0
+            index += 1
+            continue
+
+        if char in ("'", '"') and not escaped:
+            current_quote = char
+            backslash_run = 0
+            index += 1
+            continue
+
+        at_root = open_parens == 0 and open_square_brackets == 0 and open_curly_braces == 0
+
+        if formula_end is None and char == "," and at_root:
+            formula_end = index
+
+        if char == ")" and at_root:
+            statement_close_idx = index
+            if formula_end is None:
+                formula_end = index
+            break
+
+        if char == "(":
+            open_parens += 1
+        elif char == ")" and open_parens > 0:
+            open_parens -= 1
+        elif char == "[":
+            open_square_brackets += 1
+        elif char == "]" and open_square_brackets > 0:
+            open_square_brackets -= 1
+        elif char == "{":
+            open_curly_braces += 1
+        elif char == "}" and open_curly_braces > 0:
+            open_curly_braces -= 1
+
+        backslash_run = backslash_run + 1 if char == "\\" else 0
+        index += 1
+
+    if formula_end is None:
+        formula_end = index
+
+    if statement_close_idx is None:
+        statement_close_idx = index
+
+    statement_end = statement_close_idx
+    while statement_end + 1 < len(content) and content[statement_end + 1].isspace():
+        statement_end += 1
+    if statement_end + 1 < len(content) and content[statement_end + 1] == ".":
+        statement_end += 1
+
+    formula = content[formula_start:formula_end].strip()
+    full_statement = content[match.start():statement_end + 1].strip()
+    if not full_statement.endswith("."):
+        full_statement += "."
+
+    return {
+        "type": match.group(1),
+        "name": match.group(2),
+        "role": match.group(3),
+        "formula": formula,
+        "full_statement": full_statement,
+    }
+
+
+def legacy_split(raw_content: str) -> List[Dict[str, str]]:
+    masked = legacy_mask_comments(raw_content)
+    return [legacy_extract_tptp_components(m, masked) for m in tptp_parser.TPTP_HEADER_RE.finditer(masked)]
+
+
+def lexer_split(raw_content: str) -> List[Dict[str, str]]:
+    return list(tptp_parser.iter_tptp_statements(tptp_parser.mask_comments(raw_content)))
+
+
+def synthetic_axiom_file(num_statements: int = 20000, seed: int = 0) -> str:
+    """
+    Build a CSR/SWB-sized axiom file with header comments, quoted names and nested formulas.
+    """
+    rng = random.Random(seed)
+    lines = ["%" + "-" * 75, "% File     : SYN000+0.ax : synthetic benchmark axioms", "%" + "-" * 75]
+    for idx in range(num_statements):
+        pred = f"p{rng.randrange(500)}"
+        func = f"f{rng.randrange(200)}"
+        if idx % 50 == 0:
+            lines.append(f"/* block comment {idx} with 'quotes' and (parens) */")
+        lines.append(f"% comment before ax{idx}")
+        # Like the real library, only a few statements use quoted symbols or annotations.
+        atom = f"'{func} name'(Y, \"s{idx}\")" if idx % 25 == 0 else f"{func}(Y, s{idx})"
+        annotation = f", file('SYN000+0.ax', ax{idx})" if idx % 40 == 0 else ""
+        lines.append(
+            f"fof(ax{idx}, axiom, ( ! [X, Y] : ( ( {pred}(X) & {atom} ) "
+            f"=> ? [Z] : ( {pred}({func}(X, Z)) | ~ q{idx % 97}(Z, [a, b]) ) ) ){annotation})."
+        )
+    return "\n".join(lines) + "\n"
+
+
+def largest_axiom_files(tptp_dir: str, count: int) -> List[str]:
+    paths = glob.glob(os.path.join(tptp_dir, "Axioms", "**", "*.ax"), recursive=True)
+    return sorted(paths, key=os.path.getsize, reverse=True)[:count]
+
+
+def time_best(func: Callable[[str], List[Dict[str, str]]], content: str, repeat: int) -> Tuple[float, List[Dict[str, str]]]:
+    best = float("inf")
+    result: List[Dict[str, str]] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TPTP lexer against the legacy parser.")
+    parser.add_argument("--tptp-dir", default=DEFAULT_TPTP_DIR)
+    parser.add_argument("--files", type=int, default=5, help="Number of largest .ax files to time.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    inputs: List[Tuple[str, str]] = []
+    for path in largest_axiom_files(args.tptp_dir, args.files):
+        with open(path, "r", encoding="utf-8") as f:
+            inputs.append((os.path.basename(path), f.read()))
+    if not inputs:
+        print(f"No .ax files under {args.tptp_dir}, using a synthetic axiom file instead.")
+        inputs.append(("synthetic.ax", synthetic_axiom_file()))
+
+    print(f"{'file':<20} {'size MB':>8} {'stmts':>7} {'legacy s':>9} {'lexer s':>9} {'speedup':>8}")
+    print("-" * 66)
+    for name, content in inputs:
+        legacy_time, legacy_result = time_best(legacy_split, content, args.repeat)
+        lexer_time, lexer_result = time_best(lexer_split, content, args.repeat)
+        if legacy_result != lexer_result:
+            raise AssertionError(f"Lexer output differs from the legacy parser on {name}")
+        print(
+            f"{name:<20} {len(content) / 1e6:>8.2f} {len(lexer_result):>7} "
+            f"{legacy_time:>9.3f} {lexer_time:>9.3f} {legacy_time / max(lexer_time, 1e-9):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
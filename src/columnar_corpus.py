@@ -0,0 +1,187 @@
+import os
+import json
+import hashlib
+import argparse
+from array import array
+from typing import Any, BinaryIO, Dict
+
+import numpy as np
+
+from src.jsonl_reader import AXIOM_TABLE_SUFFIX, JSONLDataset
+
+
+# Column files written by export_corpus. Ragged columns are a flat value array plus an
+# offsets array of length n + 1, so row i is values[offsets[i]:offsets[i + 1]].
+META_FILE = "meta.json"
+CONJECTURE_BYTES = "conjecture.bin"
+CONJECTURE_OFFSETS = "conjecture_offsets.npy"
+AXIOM_BYTES = "axioms.bin"
+AXIOM_OFFSETS = "axiom_offsets.npy"
+POSITIVE_IDS = "positive_ids.npy"
+POSITIVE_OFFSETS = "positive_offsets.npy"
+NEGATIVE_IDS = "negative_ids.npy"
+NEGATIVE_OFFSETS = "negative_offsets.npy"
+COLUMNAR_VERSION = 1
+
+
+class _AxiomColumnWriter:
+    """
+    Streams deduplicated axiom statements (as canonical JSON) into axioms.bin.
+    """
+    def __init__(self, handle: BinaryIO):
+        self.handle = handle
+        self.offsets = array('q', [0])
+        self.ids: Dict[bytes, int] = {}
+
+    def add_encoded(self, encoded: bytes) -> int:
+        self.handle.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+        return len(self.offsets) - 2
+
+    def id_for(self, statement: Any) -> int:
+        encoded = json.dumps(statement, sort_keys=True).encode("utf-8")
+        key = hashlib.blake2b(encoded, digest_size=16).digest()
+        axiom_id = self.ids.get(key)
+        if axiom_id is None:
+            axiom_id = self.ids[key] = self.add_encoded(encoded)
+        return axiom_id
+
+
+def export_corpus(corpus_path: str, out_dir: str) -> Dict[str, Any]:
+    """
+    Convert a corpus JSONL (inline or normalized) into memory-mappable NumPy columns.
+
+    Per problem it keeps the conjecture and the positive/negative axiom ids. Inline corpora get
+    their statements deduplicated into a fresh axiom column; normalized corpora keep the ids of
+    their <corpus>.axioms.jsonl table (conjecture ids are resolved to statements).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    table_path = corpus_path + AXIOM_TABLE_SUFFIX
+    normalized = os.path.exists(table_path)
+    table = JSONLDataset(table_path) if normalized else None
+
+    conjecture_offsets = array('q', [0])
+    positive_ids, positive_offsets = array('q'), array('q', [0])
+    negative_ids, negative_offsets = array('q'), array('q', [0])
+
+    with open(os.path.join(out_dir, AXIOM_BYTES), 'wb') as axiom_handle, \
+            open(os.path.join(out_dir, CONJECTURE_BYTES), 'wb') as conjecture_handle:
+        axioms = _AxiomColumnWriter(axiom_handle)
+
+        if normalized:
+            # Table line i is axiom id i, copy it across as-is.
+            with open(table_path, 'rb') as table_handle:
+                for line in table_handle:
+                    if line.strip():
+                        axioms.add_encoded(line.strip())
+
+        with open(corpus_path, 'rb') as corpus:
+            for line in corpus:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+
+                conjecture = record.get("conjecture")
+                if table is not None and conjecture is not None:
+                    conjecture = [table[axiom_id] for axiom_id in conjecture]
+                conjecture = json.dumps(conjecture).encode("utf-8")
+                conjecture_handle.write(conjecture)
+                conjecture_offsets.append(conjecture_offsets[-1] + len(conjecture))
+
+                for key, ids, offsets in (("positives", positive_ids, positive_offsets),
+                                          ("negatives", negative_ids, negative_offsets)):
+                    values = record.get(key, [])
+                    ids.extend(values if normalized else [axioms.id_for(statement) for statement in values])
+                    offsets.append(len(ids))
+
+    for name, values in ((CONJECTURE_OFFSETS, conjecture_offsets), (AXIOM_OFFSETS, axioms.offsets),
+                         (POSITIVE_IDS, positive_ids), (POSITIVE_OFFSETS, positive_offsets),
+                         (NEGATIVE_IDS, negative_ids), (NEGATIVE_OFFSETS, negative_offsets)):
+        np.save(os.path.join(out_dir, name), np.array(values, dtype=np.int64))
+    if table is not None:
+        table.close()
+
+    stat = os.stat(corpus_path)
+    meta = {
+        "version": COLUMNAR_VERSION,
+        "source": os.path.abspath(corpus_path),
+        "source_signature": [stat.st_size, stat.st_mtime_ns],
+        "num_problems": len(conjecture_offsets) - 1,
+        "num_axioms": len(axioms.offsets) - 1,
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class ColumnarCorpus:
+    """
+    Read-only, memory-mapped view of a corpus exported by export_corpus.
+
+    Id columns are returned as zero-copy NumPy slices of the mapped files, and text columns as
+    memoryviews until they are explicitly decoded, so a full pass is bounded by I/O, not json.loads.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != COLUMNAR_VERSION:
+            raise ValueError(f"Unsupported columnar corpus version in {directory}: {self.meta.get('version')}")
+
+        self.conjecture_offsets = self._load(CONJECTURE_OFFSETS)
+        self.axiom_offsets = self._load(AXIOM_OFFSETS)
+        self.positive_ids = self._load(POSITIVE_IDS)
+        self.positive_offsets = self._load(POSITIVE_OFFSETS)
+        self.negative_ids = self._load(NEGATIVE_IDS)
+        self.negative_offsets = self._load(NEGATIVE_OFFSETS)
+        self.conjecture_bytes = self._load_bytes(CONJECTURE_BYTES)
+        self.axiom_bytes = self._load_bytes(AXIOM_BYTES)
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, name), mmap_mode='r')
+
+    def _load_bytes(self, name: str) -> np.ndarray:
+        path = os.path.join(self.directory, name)
+        # np.memmap cannot map an empty file.
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode='r')
+
+    def __len__(self) -> int:
+        return len(self.conjecture_offsets) - 1
+
+    @property
+    def num_axioms(self) -> int:
+        return len(self.axiom_offsets) - 1
+
+    def positives(self, idx: int) -> np.ndarray:
+        """Axiom ids of the positives of problem idx (a view, no copy)."""
+        return self.positive_ids[self.positive_offsets[idx]:self.positive_offsets[idx + 1]]
+
+    def negatives(self, idx: int) -> np.ndarray:
+        """Axiom ids of the negatives of problem idx (a view, no copy)."""
+        return self.negative_ids[self.negative_offsets[idx]:self.negative_offsets[idx + 1]]
+
+    def conjecture_raw(self, idx: int) -> memoryview:
+        """UTF-8 JSON of the conjecture field of problem idx, without copying."""
+        return memoryview(self.conjecture_bytes[self.conjecture_offsets[idx]:self.conjecture_offsets[idx + 1]])
+
+    def conjecture(self, idx: int) -> Any:
+        return json.loads(bytes(self.conjecture_raw(idx)))
+
+    def axiom_raw(self, axiom_id: int) -> memoryview:
+        """UTF-8 JSON of axiom axiom_id, without copying."""
+        return memoryview(self.axiom_bytes[self.axiom_offsets[axiom_id]:self.axiom_offsets[axiom_id + 1]])
+
+    def axiom(self, axiom_id: int) -> Any:
+        return json.loads(bytes(self.axiom_raw(axiom_id)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a corpus JSONL into memory-mappable NumPy columns.")
+    parser.add_argument("corpus", help="Corpus JSONL written by create_corpus.py.")
+    parser.add_argument("out_dir", help="Directory for the column files.")
+    args = parser.parse_args()
+
+    meta = export_corpus(args.corpus, args.out_dir)
+    print(f"Exported {meta['num_problems']} problems and {meta['num_axioms']} distinct axioms to {args.out_dir}")
@@ -1,11 +1,21 @@
+import os
 import json
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, Optional, Tuple
 import src.tptp_parser as tptp_parser
+from src.jsonl_reader import AXIOM_TABLE_SUFFIX, STATEMENT_KEYS
+from src.tptp_store import TPTPStore
 
 
 # Filepath Constants
 TPTP_DIR = "/Users/xiaoma/ThirdYearProject/data/TPTP-v9.2.1"
 INPUT_FILE = "/Users/xiaoma/ThirdYearProject/data/results/dataset.jsonl"
 OUTPUT_FILE = "/Users/xiaoma/ThirdYearProject/data/results/tptp_corpus.jsonl"
+# Built by `python -m src.tptp_store index`; used instead of re-parsing when present.
+STORE_FILE = "/Users/xiaoma/ThirdYearProject/data/tptp_store.sqlite"
 AXIOM_LIKE = {
     "axiom",
     "hypothesis",
@@ -17,78 +27,185 @@ AXIOM_LIKE = {
     "conjecture",
     "negated_conjecture"
 }
+# Problems submitted to the pool but not yet written, per worker.
+IN_FLIGHT_PER_WORKER = 4
+
+# Per-process store handle, set by init_worker.
+_store: Optional[TPTPStore] = None
+
+
+def init_worker(store_file: Optional[str]) -> None:
+    """
+    Open the library store (if there is one) once per process.
+    """
+    global _store
+    _store = TPTPStore(store_file, TPTP_DIR) if store_file and os.path.exists(store_file) else None
+
+
+class AxiomTable:
+    """
+    Global, deduplicated statement table of a normalized corpus.
+
+    Each distinct statement is appended once to the table file; its id is its line number there.
+    """
+    def __init__(self, path: str):
+        self.file = open(path, 'w', encoding="utf-8")
+        self.ids: Dict[bytes, int] = {}
+
+    def id_for(self, statement: Dict[str, str]) -> int:
+        encoded = json.dumps(statement, sort_keys=True)
+        key = hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).digest()
+        axiom_id = self.ids.get(key)
+        if axiom_id is None:
+            axiom_id = self.ids[key] = len(self.ids)
+            self.file.write(encoded + "\n")
+        return axiom_id
+
+    def normalize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of record with every statement list replaced by a list of ids."""
+        normalized = dict(record)
+        for key in STATEMENT_KEYS:
+            normalized[key] = [self.id_for(statement) for statement in record[key]]
+        # Flush the table first, so every id on disk always resolves.
+        self.file.flush()
+        return normalized
+
+    def close(self):
+        self.file.close()
+
+
+def process_line(line: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """
+    Turn one dataset.jsonl line into a corpus record.
+
+    Returns:
+        (outcome, message, record) where outcome is "no_proof", "skipped" or "written",
+        and record is only set for "written".
+    """
+    tptp_obj = json.loads(line)
+
+    if not tptp_obj['proof_found']:
+        return "no_proof", "", None
+
+    tptp_filepath = tptp_obj['filepath']
+    tptp_pos_names = tptp_obj['positive_axioms']
+    tptp_pos_names_set = set(tptp_pos_names)
+    tptp_conjecture = []
+    tptp_neg_conjecture = []
+    tptp_pos = []
+    tptp_neg = []
+    tptp_always_include = []
+
+    # Recursively retrive all formulas
+    all_formulas = tptp_parser.parse_tptp_file(tptp_filepath, TPTP_DIR, store=_store)
+
+    for name, data in all_formulas.items():
+        # We only record axiom-like formulas as rankable premises.
+        if data["role"] in AXIOM_LIKE:
+            if data["role"] == "conjecture":
+                tptp_conjecture.append(data)
+            # We separate conjecture and negated conjecture.
+            elif data["role"] == "negated_conjecture":
+                tptp_neg_conjecture.append(data)
+            elif name in tptp_pos_names_set:
+                tptp_pos.append(data)
+            else:
+                tptp_neg.append(data)
+        else:
+            tptp_always_include.append(data)
+
+    message = f"Processing tptp file: {tptp_obj['filename']}..."
+
+    if len(tptp_pos) == 0:
+        return "skipped", message + "\nNo positive axioms found! Skipping...", None
+
+    if len(tptp_conjecture) == 0:
+        return "skipped", message + "\nNo conjecture found! Skipping...", None
+
+    message += f"\nFound {len(tptp_conjecture)} conjecture, writing the json line..."
+    record = {
+        'filename': tptp_obj['filename'],
+        'filepath': tptp_filepath,
+        'conjecture': tptp_conjecture,
+        'negated_conjecture': tptp_neg_conjecture,
+        'positives': tptp_pos,
+        'negatives': tptp_neg,
+        'always_include': tptp_always_include
+    }
+    return "written", message, record
+
+
+def process_parallel(lines: Iterable[str], workers: int) -> Iterator[Tuple[str, str, Optional[Dict[str, Any]]]]:
+    """
+    Run process_line over a process pool and yield results in input order.
+
+    At most workers * IN_FLIGHT_PER_WORKER problems are submitted ahead of the one being written,
+    so a slow huge problem stalls submission instead of letting finished results pile up in memory.
+    """
+    max_in_flight = workers * IN_FLIGHT_PER_WORKER
+    pending: Deque[Future] = deque()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(STORE_FILE,)) as executor:
+        for line in lines:
+            pending.append(executor.submit(process_line, line))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the premise-selection corpus from dataset.jsonl.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (default: 1, i.e. serial).")
+    parser.add_argument("--format", choices=["inline", "normalized"], default="inline",
+                        help="inline: full statements in every record; normalized: statements stored once in "
+                             f"OUTPUT_FILE{AXIOM_TABLE_SUFFIX} and referenced by integer id.")
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    # Keep two counters for better auditability.
+    skipped = 0
+    no_proof = 0
+
+    # A stale table from an earlier normalized run would make JSONLDataset misread an inline corpus.
+    table_path = OUTPUT_FILE + AXIOM_TABLE_SUFFIX
+    if os.path.exists(table_path):
+        os.remove(table_path)
+    axiom_table = AxiomTable(table_path) if args.format == "normalized" else None
+
     try:
         with open(INPUT_FILE, "r", encoding="utf-8") as f:
             with open(OUTPUT_FILE, 'w', encoding="utf-8") as o:
-                # Keep two counters for better auditability.
-                skipped = 0
-                no_proof = 0
-
-                for line in f:
-                    tptp_obj = json.loads(line)
+                if workers == 1:
+                    init_worker(STORE_FILE)
+                    results = map(process_line, f)
+                else:
+                    results = process_parallel(f, workers)
 
-                    if not tptp_obj['proof_found']:
+                # Counters and output are updated here only, so they stay exact whatever the worker count.
+                for outcome, message, record in results:
+                    if outcome == "no_proof":
                         no_proof += 1
                         continue
 
-                    print(f"Processing tptp file: {tptp_obj['filename']}...")
-                    tptp_filepath = tptp_obj['filepath']
-                    tptp_pos_names = tptp_obj['positive_axioms']
-                    tptp_pos_names_set = set(tptp_pos_names)
-                    tptp_conjecture = []
-                    tptp_neg_conjecture = []
-                    tptp_pos = []
-                    tptp_neg = []
-                    tptp_always_include = []
-
-                    # Recursively retrive all formulas
-                    all_formulas = tptp_parser.parse_tptp_file(tptp_filepath, TPTP_DIR)
-                    
-                    for name, data in all_formulas.items():
-                        # We only record axiom-like formulas as rankable premises.
-                        if data["role"] in AXIOM_LIKE:
-                            if data["role"] == "conjecture":
-                                tptp_conjecture.append(data)
-                            # We separate conjecture and negated conjecture.
-                            elif data["role"] == "negated_conjecture":
-                                tptp_neg_conjecture.append(data)
-                            elif name in tptp_pos_names_set:
-                                tptp_pos.append(data)
-                            else:
-                                tptp_neg.append(data)
-                        else:
-                            tptp_always_include.append(data)
-
-                    if len(tptp_pos) == 0:
-                        skipped += 1
-                        print("No positive axioms found! Skipping...")
-                        continue
-
-                    if len(tptp_conjecture) == 0:
+                    print(message)
+                    if outcome == "skipped":
                         skipped += 1
-                        print("No conjecture found! Skipping...")
                         continue
 
-                    print(f"Found {len(tptp_conjecture)} conjecture, writing the json line...")
-
-                    json_line = json.dumps(
-                        {
-                            'filename': tptp_obj['filename'],
-                            'filepath': tptp_filepath,
-                            'conjecture': tptp_conjecture,
-                            'negated_conjecture': tptp_neg_conjecture,
-                            'positives': tptp_pos,
-                            'negatives': tptp_neg,
-                            'always_include': tptp_always_include
-                        }
-                    )
-                    o.write(json_line + "\n")
+                    if axiom_table is not None:
+                        record = axiom_table.normalize(record)
+                    o.write(json.dumps(record) + "\n")
                     o.flush()
 
     except FileNotFoundError:
         print(f"Cannot find file: {INPUT_FILE}, check your dataset.jsonl directory!")
+    finally:
+        if axiom_table is not None:
+            axiom_table.close()
+            print(f"Axiom table: {len(axiom_table.ids)} distinct statements in {table_path}")
 
-    print(f"Finished generating the corpus! Number of unproved problems: {no_proof}; Number of skipped problems: {skipped}.")
\ No newline at end of file
+    print(f"Finished generating the corpus! Number of unproved problems: {no_proof}; Number of skipped problems: {skipped}.")
+    if workers == 1:
+        print(f"Include cache: {tptp_parser.include_cache_info()}")
@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import argparse
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from src.jsonl_reader import JSONLDataset
+from src.tfidf_index import store_premises
+from src.tptp_store import TPTPStore, STORE_FILE, TPTP_DIR
+
+
+# Filepath Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+INDEX_DIR = os.path.join(ROOT_DIR, "data", "dense_index")
+VECTORS_FILE = "vectors.f32"
+AXIOMS_FILE = "axioms.jsonl"
+META_FILE = "meta.json"
+
+EMBEDDING_DIM = 1024
+NGRAM_RANGE = (3, 5)
+# Axiom rows scored per dot product, so a query batch never materialises a (batch x library) matrix.
+SCORE_CHUNK_ROWS = 65536
+ENCODE_BATCH_SIZE = 4096
+
+
+class HashedNgramEncoder:
+    """
+    Stateless CPU encoder: character n-grams hashed into a fixed number of signed buckets, L2-normalised.
+    Nothing is fitted, so vectors encoded at different times (appends) stay comparable.
+    """
+    def __init__(self, dim: int = EMBEDDING_DIM, ngram_range: Tuple[int, int] = NGRAM_RANGE):
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+        self.vectorizer = HashingVectorizer(
+            analyzer="char",
+            ngram_range=self.ngram_range,
+            lowercase=False,
+            n_features=dim,
+            alternate_sign=True,
+            norm="l2",
+            dtype=np.float32,
+        )
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self.vectorizer.transform(texts).toarray().astype(np.float32, copy=False)
+
+    def config(self) -> Dict:
+        return {"encoder": "hashed_char_ngrams", "dim": self.dim, "ngram_range": list(self.ngram_range)}
+
+
+class DenseIndex:
+    """
+    Append-only dense-vector index of axiom formulas, stored under one directory.
+
+    vectors.f32 holds the raw float32 rows, memory-mapped on read; axioms.jsonl holds the matching
+    {"id", "text"} per row and meta.json the row count and encoder settings. The row count in
+    meta.json is written last, so an interrupted append is ignored and overwritten by the next one.
+    Rows are unit length, so a dot product is cosine similarity.
+    """
+    def __init__(self, directory: str = INDEX_DIR, dim: Optional[int] = None):
+        """
+        Open the index in directory, creating it if needed. dim defaults to the existing index's
+        dimension (EMBEDDING_DIM for a new one); a different explicit dim raises ValueError.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if dim is not None and dim != meta["dim"]:
+                raise ValueError(f"{directory} holds {meta['dim']}-dimensional vectors, not {dim}; "
+                                 "use another directory to build an index of a different dimension.")
+            self.encoder = HashedNgramEncoder(meta["dim"], meta["ngram_range"])
+            self.count = meta["count"]
+        else:
+            self.encoder = HashedNgramEncoder(EMBEDDING_DIM if dim is None else dim)
+            self.count = 0
+
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        axioms_path = os.path.join(directory, AXIOMS_FILE)
+        if os.path.exists(axioms_path):
+            with open(axioms_path, "r", encoding="utf-8") as f:
+                for line, _ in zip(f, range(self.count)):
+                    axiom = json.loads(line)
+                    self.ids.append(axiom["id"])
+                    self.texts.append(axiom["text"])
+        self.positions: Dict[str, int] = {axiom_id: row for row, axiom_id in enumerate(self.ids)}
+        self._vectors: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            if self.count == 0:
+                self._vectors = np.zeros((0, self.encoder.dim), dtype=np.float32)
+            else:
+                self._vectors = np.memmap(os.path.join(self.directory, VECTORS_FILE), dtype=np.float32,
+                                          mode="r", shape=(self.count, self.encoder.dim))
+        return self._vectors
+
+    def add(self, axioms: Iterable[Tuple[str, str]]) -> int:
+        """Encode and append (id, text) pairs whose id is not indexed yet. Returns the number appended."""
+        new_axioms = []
+        seen = set()
+        for axiom_id, text in axioms:
+            if axiom_id not in self.positions and axiom_id not in seen:
+                seen.add(axiom_id)
+                new_axioms.append((axiom_id, text))
+        if not new_axioms:
+            return 0
+
+        row_bytes = 4 * self.encoder.dim
+        with open(os.path.join(self.directory, VECTORS_FILE), "ab") as vectors_file, \
+                open(os.path.join(self.directory, AXIOMS_FILE), "a", encoding="utf-8") as axioms_file:
+            # Drop whatever an interrupted append left past the committed rows.
+            vectors_file.truncate(self.count * row_bytes)
+            axioms_file.seek(0)
+            axioms_file.truncate(self._committed_axioms_bytes())
+            for start in range(0, len(new_axioms), ENCODE_BATCH_SIZE):
+                batch = new_axioms[start:start + ENCODE_BATCH_SIZE]
+                vectors_file.write(self.encoder.encode([text for _, text in batch]).tobytes())
+                for axiom_id, text in batch:
+                    axioms_file.write(json.dumps({"id": axiom_id, "text": text}) + "\n")
+
+        # The rows only exist once meta.json counts them; the in-memory index follows only then,
+        # so a failed write leaves it pointing at committed rows only.
+        count = self.count + len(new_axioms)
+        meta = dict(self.encoder.config(), count=count)
+        _replace_file(os.path.join(self.directory, META_FILE), json.dumps(meta).encode("utf-8"))
+        for axiom_id, text in new_axioms:
+            self.positions[axiom_id] = len(self.ids)
+            self.ids.append(axiom_id)
+            self.texts.append(text)
+        self.count = count
+        self._vectors = None
+        return len(new_axioms)
+
+    def _committed_axioms_bytes(self) -> int:
+        path = os.path.join(self.directory, AXIOMS_FILE)
+        size = 0
+        with open(path, "rb") as f:
+            for line, _ in zip(f, range(self.count)):
+                size += len(line)
+        return size
+
+    def query(self, conjectures: Sequence[str], k: int) -> List[List[Tuple[int, float]]]:
+        """Top-k (axiom row, cosine score) pairs for every conjecture, best first."""
+        if not conjectures or self.count == 0:
+            return [[] for _ in conjectures]
+        queries = self.encoder.encode(conjectures)
+        k = min(k, self.count)
+
+        best_rows = np.empty((len(conjectures), 0), dtype=np.int64)
+        best_scores = np.empty((len(conjectures), 0), dtype=np.float32)
+        for start in range(0, self.count, SCORE_CHUNK_ROWS):
+            chunk_scores = queries @ self.vectors[start:start + SCORE_CHUNK_ROWS].T
+            chunk_rows = np.broadcast_to(np.arange(start, start + chunk_scores.shape[1]), chunk_scores.shape)
+            scores = np.concatenate([best_scores, chunk_scores], axis=1)
+            rows = np.concatenate([best_rows, chunk_rows], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [[(int(r), float(s)) for r, s in zip(rows, scores)] for rows, scores in zip(best_rows, best_scores)]
+
+    def select_premises(self, conjecture: str, k: int) -> List[str]:
+        """Return up to k axiom texts most similar to the conjecture, like select_premises_tfidf."""
+        return [self.texts[row] for row, _ in self.query([conjecture], k)[0]]
+
+
+def _replace_file(path: str, data: bytes) -> None:
+    """
+    Atomically replace path with data. Unlike the corpus sidecars, meta.json is the index's commit
+    point, so a failed write is raised rather than skipped.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _statement_text(statement) -> str:
+    # Corpus statements are parsed statement dicts; older corpora store plain strings.
+    return statement["formula"] if isinstance(statement, dict) else statement
+
+
+def corpus_axioms(corpus_path: str) -> Iterator[Tuple[str, str]]:
+    """(id, formula) of every distinct axiom in a corpus; ids are content hashes."""
+    dataset = JSONLDataset(corpus_path)
+    try:
+        if dataset.axiom_table is not None:
+            statements: Iterable = (dataset.axiom_table[i] for i in range(len(dataset.axiom_table)))
+        else:
+            statements = (ax for i in range(len(dataset)) for key in ("positives", "negatives")
+                          for ax in dataset[i].get(key, []))
+        for statement in statements:
+            text = _statement_text(statement)
+            yield hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest(), text
+    finally:
+        dataset.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or extend the dense axiom index.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--store", nargs="?", const=STORE_FILE, help="Add every premise in the TPTP store.")
+    source.add_argument("--corpus", help="Add every axiom of a training corpus.")
+    parser.add_argument("--tptp-dir", default=TPTP_DIR)
+    parser.add_argument("--out", default=INDEX_DIR)
+    parser.add_argument("--dim", type=int, default=None,
+                        help=f"Vector dimension of a new index (default {EMBEDDING_DIM}); must match an existing one.")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    index = DenseIndex(args.out, args.dim)
+    if args.store:
+        added = index.add(store_premises(TPTPStore(args.store, args.tptp_dir)))
+    else:
+        added = index.add(corpus_axioms(args.corpus))
+    print(f"Added {added} axioms ({len(index)} total, dim {index.encoder.dim}) "
+          f"in {time.time() - start_time:.1f}s -> {args.out}")
@@ -1,181 +1,331 @@
+import os
 import json
 import random
 import time
+import argparse
+import numpy as np
+from functools import partial
 import src.metrics as metrics
 import src.iprover_cli as iprover_cli
-from src.jsonl_reader import JSONLDataset
+from src.jsonl_reader import MMapJSONLDataset, NegativesPool
+from src.pipeline import Pipeline
 import src.tptp_builderV2 as tptp_builder
 from src.models.deepseek_math import DeepSeekScorer
-from typing import List, Dict, Any
+from src.models.score_cache import ScoreCache
+from src.prover_cache import ProverCache
+from src.premise_selector import rank_candidates_tfidf, rank_candidates_symbol_overlap
+from typing import List, Dict, Any, Optional
 
 
 # ==========================================
 # CONFIGURATION
 # ==========================================
 JSONL_PATH = "/Users/xiaoma/ThirdYearProject/data/results/final_training_corpus.jsonl"
+EVAL_OUTPUT = "/Users/xiaoma/ThirdYearProject/data/results/eval.jsonl"
 NUM_PROBLEMS_TO_EVAL = 1  # How many problems to test
+# Fixes which problems are picked and every candidate pool, so a resumed run evaluates the same pools.
+SEED = 0
+# Evaluation is a pipeline: pool -> rerank -> build -> prove, with bounded queues in between, so the
+# LLM reranks problem i+1 while iProver proves problem i. EVAL_WORKERS threads serve each of the
+# rerank and prove stages; they wait on the LLM server and iProver, not the GIL.
+EVAL_WORKERS = 1
+PIPELINE_QUEUE_SIZE = 4
 TARGET_POOL_SIZE = 100
 RECALL_AT_K: List[int] = [16, 32, 64]
 IPROVER_PREMISE_BUDGETS: List[int] = [32, 64, 100]
 IPROVER_TIME_BUDGET = 5
+# All premise budgets of a problem run concurrently; this core budget is shared by all workers.
+IPROVER_MAX_CORES = iprover_cli.MAX_CORES
+# Portfolio: stop the other budgets once one proves the problem. Their results are then "unknown",
+# so per-budget prove rates only mean "proved by this budget first".
+IPROVER_PORTFOLIO = False
+# Candidates per LLM request; 1 = pointwise, >1 = listwise (see DeepSeekScorer.score_group).
+RERANK_GROUP_SIZE = 1
+# Cascade: a cheap first stage ranks the whole pool and only its top CASCADE_TOP_M go to the LLM;
+# the rest keep their first-stage order after them. None sends the whole pool to the LLM.
+CASCADE_FIRST_STAGE: Optional[str] = None  # "tfidf", "symbols" or None
+CASCADE_TOP_M = 30
+FIRST_STAGE_RANKERS = {
+    "tfidf": rank_candidates_tfidf,
+    "symbols": rank_candidates_symbol_overlap,
+}
+
+
+def load_completed(output_file: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Read the records already in the output file, keyed by problem_id.
+    A half-written last line (left by a crash) is cut off so new records start on a fresh line.
+    """
+    completed: Dict[int, Dict[str, Any]] = {}
+    if not os.path.exists(output_file):
+        return completed
+
+    with open(output_file, "rb+") as f:
+        content = f.read()
+        if content and not content.endswith(b"\n"):
+            f.truncate(content.rfind(b"\n") + 1)
+            content = content[:content.rfind(b"\n") + 1]
+
+    for line in content.splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        completed[record["problem_id"]] = record
+    return completed
+
+
+def sample_candidates(data: Dict[str, Any], negatives_pool: NegativesPool, rng: random.Random) -> Optional[List[str]]:
+    """
+    Build the shuffled candidate pool for one problem, or None if the problem has to be skipped.
+    """
+    conj = data.get("conjecture")
+    positives = data.get("positives", [])
+    negatives = data.get("negatives", [])
+
+    # Skip invalid data
+    if not conj or not positives:
+        return None
+
+    # Target exact pool size (e.g., exactly 100 candidates in total)
+    num_needed_negatives = TARGET_POOL_SIZE - len(positives)
+
+    # This problem will be skipped only if it has even more positive axioms than the pool size.
+    # (which is highly unlikely).
+    if num_needed_negatives < 0:
+        # We skip the special cases
+        return None
+
+    # 1. Take as many hard negatives as we can from the dataset
+    available_hard_neg = min(len(negatives), num_needed_negatives)
+    sampled_negatives = rng.sample(negatives, available_hard_neg)
+
+    # 2. Pad with random 'easy' negatives from the whole corpus if we are still short,
+    # drawn in one call from everything that is neither a positive nor one of this problem's negatives.
+    shortfall = num_needed_negatives - len(sampled_negatives)
+    if shortfall > 0:
+        np_rng = np.random.default_rng(rng.getrandbits(64))
+        sampled_negatives += negatives_pool.sample_statements(shortfall, exclude=positives + negatives, rng=np_rng)
+
+    candidates = positives + sampled_negatives
+    rng.shuffle(candidates)  # Crucial: Shuffle so positives aren't always at top
+    return candidates
+
+
+def build_pool(job: Dict[str, Any], dataset: MMapJSONLDataset, negatives_pool: NegativesPool) -> Optional[Dict[str, Any]]:
+    """
+    Pipeline stage 1: sample the problem's candidate pool and run the cheap first-stage ranker.
+    """
+    idx = job["problem_id"]
+    # Seeded per problem, so the pool does not depend on which worker runs it or what ran before.
+    rng = random.Random(f"{SEED}:{idx}")
+    data = dataset[idx]
+    candidates = sample_candidates(data, negatives_pool, rng)
+    if candidates is None:
+        print(f"Skipping problem {idx} (missing data or too many positives)")
+        return None
+    conj = data["conjecture"]
+
+    # Stage 1: cheap ranking of the whole pool, only the top M are sent on to the LLM.
+    stage_start = time.time()
+    if CASCADE_FIRST_STAGE is not None:
+        first_stage = FIRST_STAGE_RANKERS[CASCADE_FIRST_STAGE](conj, candidates)
+        llm_candidates, tail = first_stage[:CASCADE_TOP_M], first_stage[CASCADE_TOP_M:]
+    else:
+        first_stage = candidates
+        llm_candidates, tail = candidates, []
+
+    job.update(
+        conjecture=conj,
+        positives=set(data["positives"]),
+        candidates=candidates,
+        first_stage=first_stage,
+        llm_candidates=llm_candidates,
+        tail=tail,
+        stage_times={"first_stage": time.time() - stage_start},
+    )
+    return job
+
+
+def rerank_pool(job: Dict[str, Any], scorer: DeepSeekScorer) -> Dict[str, Any]:
+    """
+    Pipeline stage 2: get the candidates in descending rank order from the model, and score the ranking.
+    """
+    stage_start = time.time()
+    ranked_axioms = scorer.rerank(job["conjecture"], job["llm_candidates"]) + job["tail"]
+    job["stage_times"]["llm"] = time.time() - stage_start
+
+    # Calculate recalls for this problem, after each stage.
+    pos_set = job["positives"]
+    job["recalls"] = {k: metrics.recall_at_k(ranked_axioms, pos_set, k) for k in RECALL_AT_K}
+    job["first_stage_recalls"] = {k: metrics.recall_at_k(job["first_stage"], pos_set, k) for k in RECALL_AT_K}
+    job["mrr"] = metrics.mrr(ranked_axioms, pos_set)
+    job["ranked_axioms"] = ranked_axioms
+    return job
+
+
+def build_problems(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pipeline stage 3: invoke tptp_builder.py to build the TPTP string used by iprover_cli.py for each premise budget.
+    """
+    # Take the top e.g. 16, 32, 64 premises from the ranked list for each premise budget we set.
+    job["tptp_by_budget"] = {
+        premise_budget: tptp_builder.build_tptp_problem(conjecture_raw=job["conjecture"], axioms_raw=job["ranked_axioms"][:premise_budget], problem_name=f"problem_{job['problem_id']}")
+        for premise_budget in IPROVER_PREMISE_BUDGETS
+    }
+    return job
+
+
+def prove(job: Dict[str, Any], prover_cache: ProverCache, max_cores: int) -> Dict[str, Any]:
+    """
+    Pipeline stage 4: run iProver on every premise budget and return the problem's record.
+    """
+    stage_start = time.time()
+    iprover_result: Dict[int, Any] = {}
+    try:
+        # Run iProver via iprover_cli.py on every budget at once.
+        iprover_result = iprover_cli.run_iprover_budgets(
+            job["tptp_by_budget"],
+            timeout=IPROVER_TIME_BUDGET,
+            max_cores=max_cores,
+            portfolio=IPROVER_PORTFOLIO,
+            cache=prover_cache,
+        )
+    except Exception as e:
+        print(e)
+        for premise_budget in IPROVER_PREMISE_BUDGETS:
+            iprover_result[premise_budget] = {
+                "status": "unknown",
+                "raw_szs": None,
+                "runtime": None,
+                "stdout": "iProver failed to run",
+                "stderr": str(e)
+            }
+    job["stage_times"]["prove"] = time.time() - stage_start
+
+    return {
+        "problem_id": job["problem_id"],
+        "num_candidates": len(job["candidates"]),
+        "recalls": job["recalls"],
+        "first_stage_recalls": job["first_stage_recalls"],
+        "stage_times": job["stage_times"],
+        "mrr": job["mrr"],
+        "iprover_result": iprover_result
+    }
+
+
+def print_report(records: List[Dict[str, Any]], elapsed: float, new_count: int,
+                 scorer: DeepSeekScorer, prover_cache: ProverCache, pipeline: Pipeline) -> None:
+    """
+    Final report over every record of the selected problems, including ones from earlier runs.
+    Records read back from JSON have string keys, hence the str(k) lookups.
+    """
+    print("=" * 60)
+    if not records:
+        print("No valid problems were evaluated.")
+        return
+    used_count = len(records)
+
+    # Calculate prove rate at each premise budget
+    prove_rates: Dict[int, float] = {}
+    for budget in IPROVER_PREMISE_BUDGETS:
+        result_list = [_by_key(record["iprover_result"], budget) for record in records]
+        prove_rates[budget] = metrics.prove_rate(result_list)
+
+    print(f"FINAL RESULTS ({used_count} Problems, {new_count} evaluated in this run)")
+    print(f"Cascade: {CASCADE_FIRST_STAGE or 'none'} -> top {CASCADE_TOP_M if CASCADE_FIRST_STAGE else 'all'} to LLM")
+    # Records resumed from runs before the cascade and stage timing lack those fields; the
+    # first-stage and per-stage figures only cover the records that have them.
+    cascade_records = [record for record in records if "first_stage_recalls" in record]
+    timed_records = [record for record in records if "stage_times" in record]
+    for k in RECALL_AT_K:
+        first_stage = sum(_by_key(record["first_stage_recalls"], k) for record in cascade_records)
+        final = sum(_by_key(record["recalls"], k) for record in records)
+        print(f"Average Recall@{k}: first stage {first_stage / max(len(cascade_records), 1):.4f} | "
+              f"final {final / used_count:.4f}")
+    if len(cascade_records) < used_count:
+        print(f"(first-stage recall over the {len(cascade_records)} problems that recorded it)")
+    for stage in ("first_stage", "llm", "prove"):
+        total = sum(record["stage_times"].get(stage, 0.0) for record in timed_records)
+        print(f"Stage time ({stage}): {total:.1f}s ({total / max(len(timed_records), 1):.2f}s per problem)")
+    print(f"Average MRR:       {sum(record['mrr'] for record in records) / used_count:.4f}")
+    print(f"iProver Prove Rates: {prove_rates} ")
+    print(f"LLM Latency (s):   {scorer.latency_percentiles()}")
+    print(f"Score Cache:       {scorer.cache.stats()}")
+    print(f"Prover Cache:      {prover_cache.stats()}")
+    for stage, stats in pipeline.stats().items():
+        print(f"Pipeline {stage:<7} {stats['items']:>5} items | utilisation {stats['utilisation'] * 100:5.1f}% | "
+              f"queue depth mean {stats['mean_queue_depth']:.1f} max {stats['max_queue_depth']}")
+    if new_count:
+        print(f"Total Time:        {elapsed:.1f}s ({new_count / max(elapsed, 1e-9):.2f} problems/s this run)")
+
+
+def _by_key(values: Dict, k: int) -> Any:
+    return values[k] if k in values else values[str(k)]
 
 
 def main():
-    # 1. Load Data
+    parser = argparse.ArgumentParser(description="Evaluate premise ranking and iProver success on the corpus.")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS,
+                        help="Worker threads for each of the rerank and prove stages (default: %(default)s).")
+    parser.add_argument("--problems", type=int, default=NUM_PROBLEMS_TO_EVAL)
+    parser.add_argument("--output", default=EVAL_OUTPUT)
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    # 1. Load Data (memory-mapped, so worker threads can read records concurrently)
     try:
-        dataset = JSONLDataset(JSONL_PATH)
+        dataset = MMapJSONLDataset(JSONL_PATH)
     except FileNotFoundError:
         print(f"Error: File not found at {JSONL_PATH}")
         return
-    negative_list = list(dataset.negatives)
+    # Array-backed and ordered by statement hash, so sampled pools are the same on every run.
+    negatives_pool = dataset.negatives_pool
 
     # 2. Initialize Model
-    scorer = DeepSeekScorer()
+    scorer = DeepSeekScorer(cache=ScoreCache(), group_size=RERANK_GROUP_SIZE)
+    prover_cache = ProverCache()
 
-    # 3. Select Random Problems to Test
+    # 3. Select Random Problems to Test (the same ones on every run with this seed)
     indices = list(range(len(dataset)))
-    random.shuffle(indices)
-    test_indices = indices[:NUM_PROBLEMS_TO_EVAL]
-
-    print(f"\nStarting Evaluation on {NUM_PROBLEMS_TO_EVAL} problems...")
-    print(f"Model: {scorer.model} | Target pool size per problem: {TARGET_POOL_SIZE}")
-    print("-" * 60)
+    random.Random(SEED).shuffle(indices)
+    test_indices = indices[:args.problems]
 
-    used_count = 0
+    # Skip every problem that already has a record from an earlier (possibly crashed) run.
+    completed = load_completed(args.output)
+    todo = [idx for idx in test_indices if idx not in completed]
+    records = [completed[idx] for idx in test_indices if idx in completed]
 
-    # record accumulative results
-    recall_at_k_sum: Dict[int, float] = {k: 0.0 for k in RECALL_AT_K}
-    mrr_sum = 0.0
-    # Can't use dict.fromkeys() here, somehow the initialised value all points to the same list.
-    iprover_results: Dict[int, List[iprover_cli.IProverResult]] = {k: [] for k in IPROVER_PREMISE_BUDGETS}
-    proved: Dict[int, int] = {k: 0 for k in IPROVER_PREMISE_BUDGETS}
+    print(f"\nStarting Evaluation on {len(test_indices)} problems ({len(records)} already done, {len(todo)} to go)...")
+    print(f"Model: {scorer.model} | Target pool size per problem: {TARGET_POOL_SIZE} | Workers: {workers}")
+    print("-" * 60)
 
+    max_cores = max(1, IPROVER_MAX_CORES // workers)
+    pipeline = Pipeline([
+        ("pool", partial(build_pool, dataset=dataset, negatives_pool=negatives_pool), 1),
+        ("rerank", partial(rerank_pool, scorer=scorer), workers),
+        ("build", build_problems, 1),
+        ("prove", partial(prove, prover_cache=prover_cache, max_cores=max_cores), workers),
+    ], queue_size=PIPELINE_QUEUE_SIZE)
+    new_count = 0
     start_time = time.time()
 
-    with open("/Users/xiaoma/ThirdYearProject/data/results/eval.jsonl", "a", encoding="utf-8") as out_file:
-
-        for i, idx in enumerate(test_indices, 1):
-            data = dataset[idx]
-            conj = data.get("conjecture")
-            positives = data.get("positives", [])
-            negatives = data.get("negatives", [])
-            pos_set = set(positives)
-            neg_set = set(negatives)
-
-            # Skip invalid data
-            if not conj or not positives:
-                print(f"Skipping problem {idx} (missing data)")
-                continue
-
-            # Target exact pool size (e.g., exactly 100 candidates in total)
-            num_needed_negatives = TARGET_POOL_SIZE - len(positives)
-
-            # This problem will be skipped only if it has even more positive axioms than the pool size.
-            # (which is highly unlikely).
-            if num_needed_negatives < 0:
-                # We skip the special cases
-                continue
-
-            # Increment the counter for number of problems we've processed
-            used_count += 1
-
-            # Variables to record the metrics for current problem only.
-            recalls: Dict[int, float] = {k: 0.0 for k in RECALL_AT_K}
-            iprover_result: Dict[int, Any] = {k: None for k in IPROVER_PREMISE_BUDGETS}
-
-            # 1. Take as many hard negatives as we can from the dataset
-            available_hard_neg = min(len(negatives), num_needed_negatives)
-            sampled_negatives = random.sample(negatives, available_hard_neg)
-
-            # 2. Pad with random 'easy' negatives if we are still short
-            shortfall = num_needed_negatives - len(sampled_negatives)
-            if shortfall > 0:
-                print(f" Padding with {shortfall} easy negatives...", end="")
-                max_attempts = shortfall * 10
-                while shortfall > 0 and max_attempts > 0:
-                    max_attempts -= 1
-                    rand_neg = random.choice(negative_list)
-                    if rand_neg not in neg_set and rand_neg not in pos_set:
-                        sampled_negatives.append(rand_neg)
-                        neg_set.add(rand_neg)
-                        shortfall -= 1  # Only decrement when we actually find a valid one!
-
-            candidates = positives + sampled_negatives
-            random.shuffle(candidates)  # Crucial: Shuffle so positives aren't always at top
-
-            print(f"\nProblem {i}/{NUM_PROBLEMS_TO_EVAL} (ID: {idx}): {len(candidates)} candidates...", end="", flush=True)
-
-            # Get the candidates in descending rank order from the model
-            ranked_axioms = scorer.rerank(conj, candidates)
-
-            # Calculate recalls for this problem.
-            for k in RECALL_AT_K:
-                result = metrics.recall_at_k(ranked_axioms, pos_set,k)
-                recall_at_k_sum[k] += result
-                recalls[k] = result
-
-            mrr: float = metrics.mrr(ranked_axioms, pos_set)
-            mrr_sum += mrr
-
-            # Invoke tptp_builder.py to build the TPTP string used by iprover_cli.py to construct a tempfile for iProver to run on.
-            # For each premise budget we set...
-            for premise_budget in IPROVER_PREMISE_BUDGETS:
-                # Take the top e.g. 16, 32, 64 premises from the ranked list.
-                tptp_list = ranked_axioms[:premise_budget]
-                # Build the string in valid TPTP format for iProver to use.
-                tptp_str = tptp_builder.build_tptp_problem(conjecture_raw=conj, axioms_raw=tptp_list, problem_name=f"problem_{idx}")
-                try:
-                    # Run iProver via iprover_cli.py on the given axioms
-                    result = iprover_cli.run_iprover_on_tptp(tptp_str=tptp_str, timeout=IPROVER_TIME_BUDGET)
-                    # Record the result for the current problem only.
-                    iprover_result[premise_budget] = result
-                    # Accumulate the total number of proved problems.
-                    proved[premise_budget] += 1 if result["status"] == "proved" else 0
-                    # Record the current problem result into the global record.
-                    iprover_results[premise_budget].append(result)
-                except Exception as e:
-                    print(e)
-                    iprover_result[premise_budget] = {
-                        "status": "unknown",
-                        "raw_szs": None,
-                        "runtime": None,
-                        "stdout": "iProver failed to run",
-                        "stderr": str(e)
-                    }
-
+    with open(args.output, "a", encoding="utf-8") as out_file:
+        for record in pipeline.run({"problem_id": idx} for idx in todo):
             # --- SAVE INCREMENTALLY ---
-            record = {
-                "problem_id": idx,
-                "recalls": recalls,
-                "mrr": mrr,
-                "iprover_result": iprover_result
-            }
-
+            # Only the main thread writes, one whole line per problem.
             out_file.write(json.dumps(record) + "\n")
             out_file.flush()  # <--- Crucial: Forces OS to write to disk immediately
+            records.append(record)
+            new_count += 1
+            print(f"[{new_count}/{len(todo)}] Problem {record['problem_id']}: {record['num_candidates']} candidates, "
+                  f"MRR {record['mrr']:.3f}", flush=True)
 
     # 4. Final Report
-    elapsed = time.time() - start_time
-    print("=" * 60)
-    if used_count == 0:
-        print("No valid problems were evaluated.")
-    else:
-        # Calculate prove rate at each premise budget
-        prove_rates: Dict[int, float] = {k: 0.0 for k in IPROVER_PREMISE_BUDGETS}
-        for budget in IPROVER_PREMISE_BUDGETS:
-            result_list = iprover_results[budget]
-            prove_rates[budget] = metrics.prove_rate(result_list)
-
-
-        print(f"FINAL RESULTS ({used_count} Problems)")
-        for k in RECALL_AT_K:
-            print(f"Average Recall@{k}: {recall_at_k_sum[k] / used_count:.4f}")
-        print(f"Average MRR:       {mrr_sum / used_count:.4f}")
-        print(f"iProver Prove Rates: {prove_rates} ")
-        print(f"Total Time:        {elapsed:.1f}s ({elapsed / used_count:.1f}s per problem)")
+    print_report(records, time.time() - start_time, new_count, scorer, prover_cache, pipeline)
 
     dataset.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
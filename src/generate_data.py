@@ -1,9 +1,15 @@
 import os
 import glob
 import json
+import time
+import hashlib
+import argparse
+import resource
 import subprocess
-from typing import Dict, List, Any
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, IO, Optional, Tuple
 from src.eprover_parser import parse_eprover_stdout
+from src.prover_cache import ProverCache, CACHE_FILE
 
 # Configuration Constants
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,10 +22,35 @@ EPROVER_BIN = os.path.join(ROOT_DIR, "E-Prover", "E", "PROVER", "eprover")
 
 # Time constraint for eprover
 TIMEOUT_SECONDS = 5
+# Every option except the time limit and the problem path; part of the result cache key.
+EPROVER_OPTIONS = ["--auto", "--proof-object"]
+# SZS statuses that settle a problem, so the cached result holds for any longer time limit.
+DECISIVE_STATUSES = {"Theorem", "Unsatisfiable", "CounterSatisfiable", "Satisfiable", "ContradictoryAxioms"}
+# parse_eprover_stdout reports "Unknown" when E printed no SZS line (a crash, a kill, a bad binary).
+# Such runs are never cached, or one crash would be replayed for every later run.
+NO_SZS_STATUS = "Unknown"
 
-# Path verification
-print(f"Looking for problems in: {PROBLEMS_DIR}")
-print(f"Using E-Prover at: {EPROVER_BIN}")
+# Result cache shared by the worker processes (set by init_worker).
+_prover_cache: Optional[ProverCache] = None
+
+
+def init_worker(cache_path: Optional[str]) -> None:
+    """
+    Open the prover result cache in this process; None disables caching.
+    """
+    global _prover_cache
+    _prover_cache = ProverCache(cache_path) if cache_path else None
+
+
+def content_hash(filepath: str) -> str:
+    '''
+    Return the SHA-256 hex digest of a problem file, used as its manifest key alongside the path.
+    '''
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 def process_problem(filepath: str) -> Dict[str, Any]:
@@ -32,6 +63,7 @@ def process_problem(filepath: str) -> Dict[str, Any]:
     :rtype: Dict[str, Any]
     '''
     filename = os.path.basename(filepath)
+    file_hash = content_hash(filepath) if os.path.exists(filepath) else None
 
     # Setting TPTP field in environment in case some tptp files contain "include()".
     my_env = os.environ.copy()
@@ -39,14 +71,26 @@ def process_problem(filepath: str) -> Dict[str, Any]:
 
     command = [
         EPROVER_BIN,
-        "--auto",
-        "--proof-object",
+        *EPROVER_OPTIONS,
         f"--cpu-limit={TIMEOUT_SECONDS}",
         filepath
     ]
-    
+
+    cache_key = None
+
     # Attempts to run eprover with the above command.
     try:
+        # Includes resolve against TPTP_DIR, so the library location is part of the problem's identity.
+        if _prover_cache is not None and file_hash is not None:
+            with open(filepath, "r", encoding="utf-8", errors="replace") as problem_file:
+                problem_text = problem_file.read()
+            cache_key = ProverCache.make_key(EPROVER_BIN, EPROVER_OPTIONS + [f"TPTP={TPTP_DIR}"], problem_text)
+            cached = _prover_cache.get(cache_key, TIMEOUT_SECONDS)
+            if cached is not None:
+                cached.update(filename=filename, filepath=filepath, content_hash=file_hash)
+                return cached
+
+        start_time = time.time()
         result = subprocess.run(
             command, 
             capture_output=True, 
@@ -57,22 +101,32 @@ def process_problem(filepath: str) -> Dict[str, Any]:
         
         # Parse the output
         parsed_output = parse_eprover_stdout(result.stdout)
+        if cache_key is not None and parsed_output["status"] != NO_SZS_STATUS:
+            _prover_cache.put(cache_key, TIMEOUT_SECONDS, parsed_output,
+                              decisive=parsed_output["status"] in DECISIVE_STATUSES,
+                              runtime=time.time() - start_time)
         parsed_output["filename"] = filename
         parsed_output["filepath"] = filepath
+        parsed_output["content_hash"] = file_hash
 
         return parsed_output
     
     except subprocess.TimeoutExpired as e:
-        return {
-            "filename": filename,
+        timeout_result = {
             "status": "Timeout",
             "proof_found": False,
             "used_axioms": []
         }
+        if cache_key is not None:
+            _prover_cache.put(cache_key, TIMEOUT_SECONDS, timeout_result, decisive=False)
+        timeout_result.update(filename=filename, filepath=filepath, content_hash=file_hash)
+        return timeout_result
     except Exception as e:
         print(f"-> Error: {e}")
         return {
             "filename": filename,
+            "filepath": filepath,
+            "content_hash": file_hash,
             "status": "Error",
             "proof_found": False,
             "used_axioms": [],
@@ -80,8 +134,162 @@ def process_problem(filepath: str) -> Dict[str, Any]:
         }
 
 
+def _record_result(f: IO[str], result: Dict[str, Any], idx: int, total: int) -> None:
+    """
+    Print a one-line progress report for a finished problem and append it to the output file.
+    """
+    print(f"[{idx}/{total}] {result['filename']}", end=" ", flush=True)
+    if result["proof_found"]:
+        print("-> Solved! ✅")
+    else:
+        print(f"-> {result.get('status', 'FAILED!')} ❌")
+
+    # Save the result as JSONL
+    json_line = json.dumps(result)
+    f.write(json_line + "\n")
+    f.flush()
+
+
+def run_serial(files: List[str], f: IO[str]) -> None:
+    """
+    Process every problem one after another in the current process.
+    """
+    for idx, file in enumerate(files, start=1):
+        result = process_problem(file)
+        _record_result(f, result, idx, len(files))
+
+
+def run_parallel(files: List[str], f: IO[str], workers: int, cache_path: Optional[str]) -> None:
+    """
+    Fan process_problem out over a process pool, writing results as soon as each one finishes.
+    Output order therefore follows completion order, not the order of files.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cache_path,)) as executor:
+        futures = {executor.submit(process_problem, file): file for file in files}
+        for idx, future in enumerate(as_completed(futures), start=1):
+            file = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # process_problem already catches prover errors, this only covers a dead worker.
+                print(f"-> Worker error on {file}: {e}")
+                result = {
+                    "filename": os.path.basename(file),
+                    "filepath": file,
+                    "status": "Error",
+                    "proof_found": False,
+                    "used_axioms": [],
+                    "error_msg": str(e)
+                }
+            _record_result(f, result, idx, len(files))
+
+
+def manifest_key(filepath: str) -> str:
+    """
+    Key a problem by its path below the Problems/ directory (e.g. "PUZ/PUZ001+1.p"),
+    so a manifest carries over between TPTP release directories.
+    """
+    parts = filepath.replace("\\", "/").split("/")
+    if "Problems" not in parts:
+        return filepath
+    last = len(parts) - 1 - parts[::-1].index("Problems")
+    return "/".join(parts[last + 1:])
+
+
+def load_manifest(output_file: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Read an existing dataset.jsonl into a manifest of problem key -> recorded result.
+    Lines that do not decode (e.g. a half-written last line after a crash) are ignored, and so are
+    "Error" records (missing binary, OSError, dead worker): those failures may be transient, so
+    --resume proves the problem again.
+    """
+    manifest: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(output_file):
+        return manifest
+
+    with open(output_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "Error":
+                continue
+            if record.get("filepath") and record.get("content_hash"):
+                manifest[manifest_key(record["filepath"])] = record
+    return manifest
+
+
+def plan_resume(files: List[str], output_file: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Compare the current problem files against the manifest in output_file.
+
+    Returns:
+        (pending, kept): the files that are new or whose content changed and must be re-proved,
+        and the existing records that are still valid and should be kept.
+    """
+    manifest = load_manifest(output_file)
+    pending: List[str] = []
+    kept: List[Dict[str, Any]] = []
+
+    for file in files:
+        record = manifest.get(manifest_key(file))
+        if record is not None and record["content_hash"] == content_hash(file):
+            # Unchanged problem, possibly from an older release directory: point it at the current file.
+            record["filepath"] = file
+            kept.append(record)
+        else:
+            pending.append(file)
+
+    return pending, kept
+
+
+def compact_output(output_file: str, kept: List[Dict[str, Any]]) -> None:
+    """
+    Atomically rewrite output_file with only the still-valid records, dropping stale,
+    duplicate, removed or half-written ones before new results are appended.
+    """
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for record in kept:
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp_file, output_file)
+
+
+def print_throughput(num_problems: int, elapsed: float, workers: int) -> None:
+    """
+    Print problems/s and CPU utilisation for the run.
+    CPU time covers this process plus every reaped child (pool workers and the eprover processes they spawned).
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    elapsed = max(elapsed, 1e-9)
+    utilisation = cpu_seconds / (elapsed * workers)
+
+    print("-" * 60)
+    print(f"Problems:        {num_problems} in {elapsed:.1f}s with {workers} worker(s)")
+    print(f"Throughput:      {num_problems / elapsed:.2f} problems/s")
+    print(f"CPU time:        {cpu_seconds:.1f}s ({utilisation * 100:.1f}% of {workers} core(s))")
+
+
 # Main loop for data generation.
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run E-Prover over the TPTP problem library.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (default: 1, i.e. serial).")
+    parser.add_argument("--resume", action="store_true",
+                        help="Keep results already in the output file and only prove new or changed problems.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always run E-Prover instead of reusing results from the prover cache.")
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+    cache_path = None if args.no_cache else CACHE_FILE
+
+    # Path verification
+    print(f"Looking for problems in: {PROBLEMS_DIR}")
+    print(f"Using E-Prover at: {EPROVER_BIN}")
+
     # Recursively search through every Problems subdirectories.
     search_pattern = os.path.join(PROBLEMS_DIR, "**", "*.p")
     files = glob.glob(search_pattern, recursive=True)
@@ -92,23 +300,27 @@ if __name__ == "__main__":
         print("Please check that your files are in the correct folder.")
         raise FileNotFoundError
     
-    print(f"Found {len(files)} problems. Starting processing...")
+    print(f"Found {len(files)} problems.")
+
+    mode = "w+"
+    if args.resume:
+        # Skip every problem whose path and content hash are already recorded.
+        files, kept = plan_resume(files, OUTPUT_FILE)
+        compact_output(OUTPUT_FILE, kept)
+        mode = "a"
+        print(f"Resuming: {len(kept)} up-to-date results kept, {len(files)} new or changed problems to prove.")
+
+    print(f"Starting processing with {workers} worker(s)...")
+
+    start_time = time.time()
 
     # Loop through every file detected, and parse their results.
-    with open(OUTPUT_FILE, "w+") as f:
-        for idx, file in enumerate(files, start=1):
-            filename = os.path.basename(file)
-            print(f"[{idx}/{len(files)}] {filename}", end=" ", flush=True)
-
-            # Process the problem file with our worker function above.
-            result = process_problem(file)
-            if result["proof_found"]:
-                print("-> Solved! ✅")
-            else:
-                print(f"-> {result.get('status', 'FAILED!')} ❌")
-            
-            # Save the result as JSONL
-            json_line = json.dumps(result)
-            f.write(json_line + "\n")
-            f.flush()
+    with open(OUTPUT_FILE, mode) as f:
+        if workers == 1:
+            init_worker(cache_path)
+            run_serial(files, f)
+        else:
+            run_parallel(files, f, workers, cache_path)
         print("\nDone! Data generation complete.")
+
+    print_throughput(len(files), time.time() - start_time, workers)
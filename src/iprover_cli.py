@@ -1,11 +1,26 @@
 import os
 import re
 import time
+import shutil
+import signal
+import asyncio
 import tempfile
 import subprocess
-from typing import Literal, TypedDict
+from typing import Dict, List, Literal, Optional, TypedDict
+from src.prover_cache import ProverCache
 
 IPROVER_BIN = "iprover/iproveropt"
+# Every option except the time limit and the problem path; part of the result cache key.
+IPROVER_OPTIONS = ["--tptp_safe_out", "true", "--schedule", "default"]
+# Upper bound on iProver processes running at once when several budgets are raced.
+MAX_CORES = os.cpu_count() or 1
+# Problems are staged in a RAM-backed directory when there is one, so runs never wait on the disk.
+SCRATCH_DIR = "/dev/shm" if os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+# "file": write each problem to SCRATCH_DIR; "stdin": pipe it to iProver (--stdin true), writing nothing.
+PROBLEM_DELIVERY: Literal["file", "stdin"] = "file"
+# Debug: keep every problem that was not proved in FAILURES_DIR instead of deleting it.
+KEEP_FAILURES = False
+FAILURES_DIR = "./tmp/"
 
 class IProverResult(TypedDict):
     status: Literal["proved", "failed", "unknown"]
@@ -15,25 +30,86 @@ class IProverResult(TypedDict):
     stderr: str
 
 
-def run_iprover_on_file(path: str, timeout: float = 5.0) -> IProverResult:
-    """
-    Run iproveropt on the given TPTP file and return parsed result.
-    """
+def _check_binary() -> None:
     if not os.path.exists(IPROVER_BIN):
         raise FileNotFoundError(f"iproveropt binary not found at {IPROVER_BIN}")
 
-    command = [
+
+def _iprover_command(path: Optional[str], timeout: float) -> List[str]:
+    """The iProver command line; path None reads the problem from stdin."""
+    _check_binary()
+
+    return [
         IPROVER_BIN,
         "--time_out_real", f"{timeout}",
-        "--tptp_safe_out", "true",
-        "--schedule", "default",
-        f"{path}"
+        *IPROVER_OPTIONS,
+        *(["--stdin", "true"] if path is None else [f"{path}"])
     ]
 
+
+def _cache_key(tptp_str: str) -> bytes:
+    _check_binary()
+    return ProverCache.make_key(IPROVER_BIN, IPROVER_OPTIONS, _problem_text(tptp_str))
+
+
+def _cache_put(cache: ProverCache, key: bytes, timeout: float, result: IProverResult) -> None:
+    # Without an SZS status (a crash, garbled output, a cancelled run) there is nothing worth
+    # replaying; an explicit "Unknown" says no more. Timeouts carry raw_szs "Timeout".
+    if result["raw_szs"] in (None, "Unknown"):
+        return
+    # A proof or a counter-model is an answer; anything else only holds up to this time limit.
+    cache.put(key, timeout, dict(result), decisive=result["status"] in ("proved", "failed"), runtime=result["runtime"])
+
+
+def _cancelled_result(winner: int, runtime: float) -> IProverResult:
+    return IProverResult(
+        status = "unknown",
+        raw_szs = None,
+        runtime = runtime,
+        stdout = "",
+        stderr = f"cancelled: premise budget {winner} proved the problem first"
+    )
+
+
+def _parse_result(stdout: str, stderr: str, runtime: float) -> IProverResult:
+    re_pattern = r"^%\s+SZS\s+status\s+(\w+)"
+    szs_match = re.search(re_pattern, stdout, re.MULTILINE)
+    if szs_match:
+        raw_szs = szs_match.group(1)
+        print(f"Extracted szs: {raw_szs}")
+    else:
+        raw_szs = None
+
+    status: Literal["proved", "failed", "unknown"] = "unknown"
+    if raw_szs in ["Theorem", "Unsatisfiable"]:
+        status = "proved"
+    elif raw_szs in ["CounterSatisfiable", "Satisfiable"]:
+        status = "failed"
+
+    return IProverResult(
+        status = status,
+        raw_szs = raw_szs,
+        runtime = runtime,
+        stdout = stdout,
+        stderr = stderr
+    )
+
+
+def run_iprover_on_file(path: str, timeout: float = 5.0) -> IProverResult:
+    """
+    Run iproveropt on the given TPTP file and return parsed result.
+    """
+    return _run_iprover(path, timeout)
+
+
+def _run_iprover(path: Optional[str], timeout: float, input_text: Optional[str] = None) -> IProverResult:
+    command = _iprover_command(path, timeout)
+
     try:
         start_time = time.time()
         result = subprocess.run(
             command,
+            input=input_text,
             capture_output=True,
             text=True,
             timeout=timeout + 2.0   # Force Python to stop if some external program freezes.
@@ -41,54 +117,202 @@ def run_iprover_on_file(path: str, timeout: float = 5.0) -> IProverResult:
         end_time = time.time()
         runtime = end_time - start_time
 
-        re_pattern = r"^%\s+SZS\s+status\s+(\w+)"
-        szs_match = re.search(re_pattern, result.stdout, re.MULTILINE)
-        if szs_match:
-            raw_szs = szs_match.group(1)
-            print(f"Extracted szs: {raw_szs}")
-        else:
-            raw_szs = None
-
-        status: Literal["proved", "failed", "unknown"] = "unknown"
-        if raw_szs in ["Theorem", "Unsatisfiable"]:
-            status = "proved"
-        elif raw_szs in ["CounterSatisfiable", "Satisfiable"]:
-            status = "failed"
-
-        return IProverResult(
-            status = status,
-            raw_szs = raw_szs,
-            runtime = runtime,
-            stdout = result.stdout,
-            stderr = result.stderr
-        )
+        return _parse_result(result.stdout, result.stderr, runtime)
 
     except subprocess.TimeoutExpired as e:
         return IProverResult(
             status = "unknown",
-            raw_szs = None,
+            raw_szs = "Timeout",
             runtime = timeout,
             stdout = e.stdout if e.stdout else "",
             stderr = e.stderr if e.stderr else ""
         )
 
 
+def _problem_text(tptp_str: str) -> str:
+    return tptp_str if tptp_str.endswith("\n") else tptp_str + "\n"
+
+
+def _stage_problem(tptp_str: str) -> Optional[str]:
+    """
+    Make the problem available to iProver: a file in SCRATCH_DIR, or None when it goes through stdin.
+    """
+    if PROBLEM_DELIVERY == "stdin":
+        return None
+    with tempfile.NamedTemporaryFile(mode="w", dir=SCRATCH_DIR, prefix="iprover_", suffix=".p", delete=False) as tmp:
+        tmp.write(_problem_text(tptp_str))
+        return tmp.name
+
+
+def _release_problem(path: Optional[str], tptp_str: str, failed: bool) -> None:
+    """
+    Delete a staged problem. With KEEP_FAILURES, a failed one (not proved, or the run crashed)
+    is kept in FAILURES_DIR instead.
+    """
+    if KEEP_FAILURES and failed:
+        os.makedirs(FAILURES_DIR, exist_ok=True)
+        if path is None:
+            with tempfile.NamedTemporaryFile(mode="w", dir=FAILURES_DIR, suffix=".p", delete=False) as kept:
+                kept.write(_problem_text(tptp_str))
+        else:
+            shutil.move(path, os.path.join(FAILURES_DIR, os.path.basename(path)))
+        return
+
+    if path is not None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def _run_tptp_async(tptp_str: str, timeout: float, cores: asyncio.Semaphore) -> IProverResult:
+    # The problem is only staged once a core is free, so queued budgets hold no scratch files.
+    async with cores:
+        path = _stage_problem(tptp_str)
+        result: Optional[IProverResult] = None
+        cancelled = False
+        try:
+            result = await _run_iprover_async(path, timeout, _problem_text(tptp_str) if path is None else None)
+            return result
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # A run cancelled because another budget proved the problem is not a failure worth keeping.
+            _release_problem(path, tptp_str, failed=not cancelled and (result is None or result["status"] != "proved"))
+
+
+async def _run_iprover_async(path: Optional[str], timeout: float, input_text: Optional[str] = None) -> IProverResult:
+    command = _iprover_command(path, timeout)
+
+    start_time = time.time()
+    # Own process group, so killing it also stops iProver's child solvers.
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE if input_text is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            process.communicate(input_text.encode("utf-8") if input_text is not None else None), timeout + 2.0)
+    except asyncio.TimeoutError:
+        await _kill_process_group(process)
+        return IProverResult(
+            status = "unknown",
+            raw_szs = "Timeout",
+            runtime = timeout,
+            stdout = "",
+            stderr = ""
+        )
+    except asyncio.CancelledError:
+        await _kill_process_group(process)
+        raise
+
+    runtime = time.time() - start_time
+    return _parse_result(stdout.decode("utf-8", errors="replace"),
+                         stderr.decode("utf-8", errors="replace"), runtime)
+
+
+async def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await process.wait()
+
+
+async def _race_budgets(problems: Dict[int, str], timeout: float, max_cores: int, portfolio: bool,
+                        cache: Optional[ProverCache], keys: Dict[int, bytes]) -> Dict[int, IProverResult]:
+    cores = asyncio.Semaphore(max(1, max_cores))
+    start_time = time.time()
+    tasks = {
+        asyncio.ensure_future(_run_tptp_async(tptp_str, timeout, cores)): budget
+        for budget, tptp_str in problems.items()
+    }
+    results: Dict[int, IProverResult] = {}
+    pending = set(tasks)
+    winner: Optional[int] = None
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[tasks[task]] = task.result()
+                if cache is not None:
+                    _cache_put(cache, keys[tasks[task]], timeout, results[tasks[task]])
+                if portfolio and winner is None and results[tasks[task]]["status"] == "proved":
+                    winner = tasks[task]
+            if winner is not None and pending:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                for task in pending:
+                    results[tasks[task]] = _cancelled_result(winner, time.time() - start_time)
+                pending = set()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return {budget: results[budget] for budget in problems}
+
+
+def run_iprover_budgets(tptp_by_budget: Dict[int, str], timeout: float = 5.0, max_cores: int = MAX_CORES,
+                        portfolio: bool = False, cache: Optional[ProverCache] = None) -> Dict[int, IProverResult]:
+    """
+    Run iProver on one problem per premise budget concurrently, at most max_cores at a time.
+
+    Returns a result per budget. In portfolio mode the remaining runs are killed as soon as one
+    budget proves the problem; those budgets come back as "unknown" with the reason in stderr.
+    Budgets answered by the cache are not run; cancelled runs are never cached.
+    """
+    results: Dict[int, IProverResult] = {}
+    keys: Dict[int, bytes] = {}
+    if cache is not None:
+        for budget, tptp_str in tptp_by_budget.items():
+            keys[budget] = _cache_key(tptp_str)
+            cached = cache.get(keys[budget], timeout)
+            if cached is not None:
+                results[budget] = cached
+
+    to_run = [budget for budget in tptp_by_budget if budget not in results]
+    winner = next((budget for budget, result in results.items() if result["status"] == "proved"), None)
+    if portfolio and winner is not None:
+        for budget in to_run:
+            results[budget] = _cancelled_result(winner, 0.0)
+        to_run = []
+
+    if to_run:
+        problems = {budget: tptp_by_budget[budget] for budget in to_run}
+        results.update(asyncio.run(_race_budgets(problems, timeout, max_cores, portfolio, cache, keys)))
+    return {budget: results[budget] for budget in tptp_by_budget}
+
+
 def run_iprover_on_tptp(tptp_str: str,
-                        timeout: float = 5.0) -> IProverResult:
+                        timeout: float = 5.0,
+                        cache: Optional[ProverCache] = None) -> IProverResult:
     """
-    Write tptp_str to a temp file, call run_iprover_on_file, then clean up.
+    Stage tptp_str in SCRATCH_DIR (or pipe it through stdin), run iProver on it, then clean up.
+    With a cache, an identical earlier run under a compatible time limit is returned instead.
     """
-    with tempfile.NamedTemporaryFile(mode="w+", dir="./tmp/", suffix=".p", delete=False) as tmp:
-        to_write = tptp_str if tptp_str.endswith("\n") else tptp_str + "\n"
-        tmp.write(to_write)
-        tmp_path = tmp.name
+    key = None
+    if cache is not None:
+        key = _cache_key(tptp_str)
+        cached = cache.get(key, timeout)
+        if cached is not None:
+            return cached
+
+    tmp_path = _stage_problem(tptp_str)
+    result: Optional[IProverResult] = None
 
     try:
-        return run_iprover_on_file(tmp_path, timeout)
+        result = _run_iprover(tmp_path, timeout, _problem_text(tptp_str) if tmp_path is None else None)
+        if key is not None:
+            _cache_put(cache, key, timeout, result)
+        return result
     finally:
-        # if os.path.exists(tmp_path):
-        #     os.remove(tmp_path)
-        pass
+        _release_problem(tmp_path, tptp_str, failed=result is None or result["status"] != "proved")
 
 
 if __name__ == "__main__":
@@ -1,33 +1,176 @@
+import io
+import os
+import re
 import json
-from typing import Dict, Set, Any
+import mmap
+import hashlib
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, Set, Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Sidecar files written next to the corpus, e.g. corpus.jsonl.idx and corpus.jsonl.negatives.json
+INDEX_SUFFIX = ".idx"
+NEGATIVES_SUFFIX = ".negatives.json"
+NEGATIVES_POOL_SUFFIX = ".negpool.npz"
+# Negative occurrences buffered while building the pool before they are deduplicated.
+POOL_BUILD_CHUNK = 1 << 20
+# Axiom table of a normalized corpus (see create_corpus.py --format normalized): line i holds statement id i.
+AXIOM_TABLE_SUFFIX = ".axioms.jsonl"
+STATEMENT_KEYS = ("conjecture", "negated_conjecture", "positives", "negatives", "always_include")
+AXIOM_CACHE_SIZE = 65536
+INDEX_VERSION = 1
+SCAN_CHUNK_BYTES = 16 * 1024 * 1024
 
 
 class JSONLDataset:
     """
     A memory-efficient dataset that builds an index of file offsets.
     Allows O(1) random access to any line in a multi-GB JSONL file.
+
+    The offset index is found by scanning raw bytes for newlines and is persisted to a sidecar
+    file, validated against the corpus size and mtime, so later runs load it instead of rescanning.
+    The negatives pool is only built (and persisted) the first time it is used.
+
+    If an axiom table (<corpus>.axioms.jsonl) sits next to the corpus, records are normalized:
+    their statement lists hold integer ids, which are resolved to statements on access. The
+    negatives pool of a normalized corpus holds ids; use axiom(id) to resolve one.
     """
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, use_sidecar: bool = True):
         self.filepath = filepath
-        self.file = open(filepath, 'r', encoding='utf-8')
-        self.offsets = []
-        self.negatives: Set[str] = set()
+        self.use_sidecar = use_sidecar
+        self.file = open(filepath, 'rb')
+        self.offsets = array('Q')
+        self._negatives: Optional[Set[str]] = None
+        self._negatives_pool: Optional[NegativesPool] = None
         self._build_index()
 
+        self.axiom_table: Optional[JSONLDataset] = None
+        table_path = filepath + AXIOM_TABLE_SUFFIX
+        if os.path.exists(table_path):
+            self.axiom_table = type(self)(table_path, use_sidecar)
+            self.axiom = lru_cache(maxsize=AXIOM_CACHE_SIZE)(self.axiom_table.__getitem__)
+
+    def axiom(self, axiom_id: int) -> Dict[str, Any]:
+        """Resolve an axiom id of a normalized corpus to its statement."""
+        raise ValueError(f"{self.filepath} is not a normalized corpus (no {AXIOM_TABLE_SUFFIX} table)")
+
+    def _resolve(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace axiom ids with their statements when reading a normalized corpus."""
+        if self.axiom_table is None:
+            return record
+        for key in STATEMENT_KEYS:
+            if key in record:
+                record[key] = [self.axiom(axiom_id) for axiom_id in record[key]]
+        return record
+
+    def _signature(self) -> Tuple[int, int]:
+        """(size, mtime_ns) of the corpus, used to tell whether a sidecar is still valid."""
+        stat = os.fstat(self.file.fileno())
+        return stat.st_size, stat.st_mtime_ns
+
     def _build_index(self):
-        """Scans the file once to record the byte offset of every line."""
+        """Loads the offset index from the sidecar, or scans the file once to record the byte offset of every line."""
         print(f"Indexing {self.filepath}...", end="", flush=True)
+        if self.use_sidecar and self._load_index():
+            print(f" Loaded {len(self.offsets)} samples from {self.filepath + INDEX_SUFFIX}.")
+            return
+
+        self._scan_offsets()
+        if self.use_sidecar:
+            self._save_index()
+        print(f" Done! Found {len(self.offsets)} samples.")
+
+    def _scan_offsets(self):
+        """Record the start of every non-empty line without decoding any JSON."""
+        offsets = array('Q')
         self.file.seek(0)
+        position = 0
+        line_start = 0
         while True:
-            offset = self.file.tell()
-            line = self.file.readline()
-            if not line:
+            chunk = self.file.read(SCAN_CHUNK_BYTES)
+            if not chunk:
                 break
-            content = json.loads(line)
-            negatives = content.get("negatives", [])
-            self.negatives.update(negatives)
-            self.offsets.append(offset)
-        print(f" Done! Found {len(self.offsets)} samples.")
+            newline = chunk.find(b"\n")
+            while newline != -1:
+                line_end = position + newline
+                if line_end > line_start:
+                    offsets.append(line_start)
+                line_start = line_end + 1
+                newline = chunk.find(b"\n", newline + 1)
+            position += len(chunk)
+        if position > line_start:
+            # Last line without a trailing newline.
+            offsets.append(line_start)
+        self.offsets = offsets
+
+    def _load_index(self) -> bool:
+        index_path = self.filepath + INDEX_SUFFIX
+        try:
+            with open(index_path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get("version") != INDEX_VERSION or tuple(header.get("signature", ())) != self._signature():
+                    return False
+                offsets = array('Q')
+                offsets.frombytes(f.read())
+        except (OSError, ValueError):
+            return False
+        if len(offsets) != header.get("count"):
+            return False
+        self.offsets = offsets
+        return True
+
+    def _save_index(self):
+        header = {"version": INDEX_VERSION, "signature": list(self._signature()), "count": len(self.offsets)}
+        _atomic_write(self.filepath + INDEX_SUFFIX, json.dumps(header).encode("utf-8") + b"\n" + self.offsets.tobytes())
+
+    @property
+    def negatives(self) -> Set[str]:
+        """Every negative statement in the corpus, built on first use and cached in a sidecar."""
+        if self._negatives is None:
+            self._negatives = self._load_negatives() if self.use_sidecar else None
+            if self._negatives is None:
+                self._negatives = self._collect_negatives()
+                if self.use_sidecar:
+                    self._save_negatives()
+        return self._negatives
+
+    @property
+    def negatives_pool(self) -> "NegativesPool":
+        """Compact, array-backed alternative to negatives for sampling (see NegativesPool)."""
+        if self._negatives_pool is None:
+            self._negatives_pool = NegativesPool(self)
+        return self._negatives_pool
+
+    def _collect_negatives(self) -> Set[str]:
+        print(f"Collecting negatives pool from {self.filepath}...", end="", flush=True)
+        negatives: Set[str] = set()
+        self.file.seek(0)
+        for line in self.file:
+            if line.strip():
+                negatives.update(json.loads(line).get("negatives", []))
+        print(f" Done! Found {len(negatives)} negatives.")
+        return negatives
+
+    def _load_negatives(self) -> Optional[Set[str]]:
+        try:
+            with open(self.filepath + NEGATIVES_SUFFIX, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if content.get("version") != INDEX_VERSION or tuple(content.get("signature", ())) != self._signature():
+            return None
+        return set(content["negatives"])
+
+    def _save_negatives(self):
+        content = {
+            "version": INDEX_VERSION,
+            "signature": list(self._signature()),
+            "negatives": sorted(self._negatives),
+        }
+        _atomic_write(self.filepath + NEGATIVES_SUFFIX, json.dumps(content).encode("utf-8"))
 
     def __len__(self):
         return len(self.offsets)
@@ -39,7 +182,259 @@ class JSONLDataset:
 
         self.file.seek(self.offsets[idx])
         line = self.file.readline()
-        return json.loads(line)
+        return self._resolve(json.loads(line))
 
     def close(self):
-        self.file.close()
\ No newline at end of file
+        if self._negatives_pool is not None:
+            self._negatives_pool.close()
+        self.file.close()
+        if self.axiom_table is not None:
+            self.axiom_table.close()
+
+
+class MMapJSONLDataset(JSONLDataset):
+    """
+    A JSONLDataset that reads records out of a read-only memory map instead of seek + readline.
+
+    There is no shared file cursor, so one instance can be used from many threads at once and
+    inherited by forked worker processes without reopening the file. Records are sliced straight
+    from the mapping, and get_many / slicing fetch a whole batch in one call.
+    """
+    def __init__(self, filepath: str, use_sidecar: bool = True):
+        super().__init__(filepath, use_sidecar)
+        self._lock = threading.Lock()
+        size = os.fstat(self.file.fileno()).st_size
+        self.mm: Optional[mmap.mmap] = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._size = size
+
+    def _record_bytes(self, idx: int) -> bytes:
+        if idx < 0 or idx >= len(self.offsets):
+            raise IndexError("Index out of bounds")
+        start = self.offsets[idx]
+        end = self.mm.find(b"\n", start)
+        return self.mm[start:end if end != -1 else self._size]
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """Retrieves the line at index idx, or a list of records for a slice."""
+        if isinstance(idx, slice):
+            return self.get_many(range(*idx.indices(len(self))))
+        return self._resolve(json.loads(self._record_bytes(idx)))
+
+    def get_many(self, indices: Iterable[int]) -> List[Dict[str, Any]]:
+        """Retrieves the records at the given indices, in the given order."""
+        return [self._resolve(json.loads(self._record_bytes(idx))) for idx in indices]
+
+    @property
+    def negatives(self) -> Set[str]:
+        with self._lock:
+            return super().negatives
+
+    @property
+    def negatives_pool(self) -> "NegativesPool":
+        with self._lock:
+            return super().negatives_pool
+
+    def _collect_negatives(self) -> Set[str]:
+        print(f"Collecting negatives pool from {self.filepath}...", end="", flush=True)
+        negatives: Set[str] = set()
+        for idx in range(len(self)):
+            negatives.update(json.loads(self._record_bytes(idx)).get("negatives", []))
+        print(f" Done! Found {len(negatives)} negatives.")
+        return negatives
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        super().close()
+
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+
+def statement_key(statement: Any) -> int:
+    """64-bit hash of a statement (string, id-resolved dict, ...) by its canonical JSON encoding."""
+    encoded = json.dumps(statement, sort_keys=True).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+
+def _iter_negative_spans(line: str) -> Iterator[Tuple[Any, int, int]]:
+    """
+    Yield (statement, start, end) for every element of the record's "negatives" list, with
+    character offsets into line. Other values are skipped by the C decoder without building records.
+    """
+    skip = _JSON_WHITESPACE_RE.match
+    pos = skip(line, skip(line, 0).end() + 1).end()  # past the '{'
+    while pos < len(line) and line[pos] != "}":
+        key, pos = _JSON_DECODER.raw_decode(line, pos)
+        pos = skip(line, skip(line, pos).end() + 1).end()  # past the ':'
+        if key == "negatives" and line[pos] == "[":
+            pos = skip(line, pos + 1).end()
+            while line[pos] != "]":
+                statement, end = _JSON_DECODER.raw_decode(line, pos)
+                yield statement, pos, end
+                pos = skip(line, end).end()
+                if line[pos] == ",":
+                    pos = skip(line, pos + 1).end()
+            pos += 1
+        else:
+            _, pos = _JSON_DECODER.raw_decode(line, pos)
+        pos = skip(line, pos).end()
+        if pos < len(line) and line[pos] == ",":
+            pos = skip(line, pos + 1).end()
+
+
+class NegativesPool:
+    """
+    Every distinct negative statement of a corpus, held as NumPy arrays instead of Python objects.
+
+    Statements are identified by statement_key and kept sorted by it; their text stays on disk and
+    is read back on demand from its byte span in the corpus (or from the axiom table, for a
+    normalized corpus). sample() draws k distinct statements outside an exclusion set in one
+    vectorized call. The arrays are cached in a <corpus>.negpool.npz sidecar.
+    """
+    def __init__(self, dataset: JSONLDataset):
+        self.dataset = dataset
+        self.keys = np.empty(0, dtype=np.uint64)
+        # Inline corpus: byte offset and length of each statement. Normalized corpus: its axiom id.
+        self.offsets = np.empty(0, dtype=np.uint64)
+        self.lengths = np.empty(0, dtype=np.uint32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self._fd = os.open(dataset.filepath, os.O_RDONLY)
+        if not (dataset.use_sidecar and self._load()):
+            self._build()
+            if dataset.use_sidecar:
+                self._save()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _build(self):
+        """
+        Scan the corpus once. Occurrences are buffered in compact typed arrays and folded into the
+        deduplicated arrays every POOL_BUILD_CHUNK entries, so peak memory stays close to the
+        final pool rather than growing with every occurrence of every negative.
+        """
+        print(f"Building negatives pool for {self.dataset.filepath}...", end="", flush=True)
+        if self.dataset.axiom_table is not None:
+            ids = np.empty(0, dtype=np.int64)
+            pending_ids = array("q")
+            for idx in range(len(self.dataset)):
+                pending_ids.extend(self._raw_record(idx).get("negatives", []))
+                if len(pending_ids) >= POOL_BUILD_CHUNK:
+                    ids = np.union1d(ids, np.array(pending_ids, dtype=np.int64))
+                    del pending_ids[:]
+            ids = np.union1d(ids, np.array(pending_ids, dtype=np.int64))
+            keys = np.fromiter((statement_key(self.dataset.axiom(int(axiom_id))) for axiom_id in ids),
+                               dtype=np.uint64, count=len(ids))
+            self.keys, first = np.unique(keys, return_index=True)
+            self.ids = ids[first]
+            print(f" Done! {len(self)} distinct negatives.")
+            return
+
+        keys = np.empty(0, dtype=np.uint64)
+        offsets = np.empty(0, dtype=np.uint64)
+        lengths = np.empty(0, dtype=np.uint32)
+        pending_keys, pending_offsets, pending_lengths = array("Q"), array("Q"), array("I")
+
+        def fold():
+            nonlocal keys, offsets, lengths
+            # Existing entries come first, so np.unique keeps the earliest occurrence of every key.
+            keys, first = np.unique(np.concatenate([keys, np.array(pending_keys, dtype=np.uint64)]),
+                                    return_index=True)
+            offsets = np.concatenate([offsets, np.array(pending_offsets, dtype=np.uint64)])[first]
+            lengths = np.concatenate([lengths, np.array(pending_lengths, dtype=np.uint32)])[first]
+            del pending_keys[:], pending_offsets[:], pending_lengths[:]
+
+        for idx in range(len(self.dataset)):
+            raw = self._raw_line(idx)
+            line = raw.decode("utf-8")
+            ascii_only = len(line) == len(raw)
+            for statement, start, end in _iter_negative_spans(line):
+                if not ascii_only:
+                    start, end = len(line[:start].encode("utf-8")), len(line[:end].encode("utf-8"))
+                pending_keys.append(statement_key(statement))
+                pending_offsets.append(self.dataset.offsets[idx] + start)
+                pending_lengths.append(end - start)
+            if len(pending_keys) >= POOL_BUILD_CHUNK:
+                fold()
+        fold()
+        self.keys, self.offsets, self.lengths = keys, offsets, lengths
+        print(f" Done! {len(self)} distinct negatives.")
+
+    def _raw_line(self, idx: int) -> bytes:
+        start = self.dataset.offsets[idx]
+        end = self.dataset.offsets[idx + 1] if idx + 1 < len(self.dataset) else os.fstat(self._fd).st_size
+        return os.pread(self._fd, end - start, start).rstrip(b"\r\n")
+
+    def _raw_record(self, idx: int) -> Dict[str, Any]:
+        return json.loads(self._raw_line(idx))
+
+    def _load(self) -> bool:
+        try:
+            with np.load(self.dataset.filepath + NEGATIVES_POOL_SUFFIX) as content:
+                signature = tuple(int(v) for v in content["signature"])
+                if signature != (INDEX_VERSION, *self.dataset._signature()):
+                    return False
+                self.keys, self.offsets = content["keys"], content["offsets"]
+                self.lengths, self.ids = content["lengths"], content["ids"]
+        except (OSError, ValueError, KeyError):
+            return False
+        return True
+
+    def _save(self):
+        buffer = io.BytesIO()
+        np.savez(buffer, signature=np.array((INDEX_VERSION, *self.dataset._signature()), dtype=np.int64),
+                 keys=self.keys, offsets=self.offsets, lengths=self.lengths, ids=self.ids)
+        _atomic_write(self.dataset.filepath + NEGATIVES_POOL_SUFFIX, buffer.getvalue())
+
+    def indices_of(self, statements: Iterable[Any]) -> np.ndarray:
+        """Sorted pool positions of the given statements; statements not in the pool are ignored."""
+        wanted = np.fromiter((statement_key(statement) for statement in statements), dtype=np.uint64)
+        positions = np.searchsorted(self.keys, wanted)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == wanted[found]
+        return np.unique(positions[found])
+
+    def sample(self, k: int, exclude: Iterable[Any] = (), rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        Pool positions of up to k distinct statements, none of them in exclude.
+        Draws k ranks among the allowed positions and shifts each past the excluded ones before it.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        excluded = self.indices_of(exclude)
+        available = len(self) - len(excluded)
+        k = min(k, available)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        ranks = rng.choice(available, size=k, replace=False)
+        # excluded[j] - j allowed positions come before the j-th excluded one.
+        return ranks + np.searchsorted(excluded - np.arange(len(excluded)), ranks, side="right")
+
+    def statement(self, position: int) -> Any:
+        if self.dataset.axiom_table is not None:
+            return self.dataset.axiom(int(self.ids[position]))
+        return json.loads(os.pread(self._fd, int(self.lengths[position]), int(self.offsets[position])))
+
+    def sample_statements(self, k: int, exclude: Iterable[Any] = (),
+                          rng: Optional[np.random.Generator] = None) -> List[Any]:
+        return [self.statement(position) for position in self.sample(k, exclude, rng)]
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _atomic_write(path: str, data: bytes):
+    """Write a sidecar via a temp file and rename, so readers never see a partial file.
+    A read-only corpus directory just means the sidecar is not cached."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f" (could not write {path}: {e})", end="")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
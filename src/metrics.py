@@ -1,4 +1,6 @@
-from typing import List, Set
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
 from src.iprover_cli import IProverResult
 
 def _dedupe_preserve_order(l: List[str]) -> List[str]:
@@ -43,4 +45,113 @@ def prove_rate(results: List[IProverResult]) -> float:
     """
     if not results: return 0.0
     successes = sum(1 for result in results if result["status"] == "proved")
-    return successes / len(results)
\ No newline at end of file
+    return successes / len(results)
+
+
+# ------------------------------------------------------------------
+# Batch metrics: score many rankings at once on a (problems x pool) relevance matrix.
+# ------------------------------------------------------------------
+# Cap on resampled values held in memory at once by the bootstrap.
+BOOTSTRAP_CHUNK_VALUES = 10_000_000
+
+
+def relevance_matrix(rankings: Sequence[Sequence[str]], pos_sets: Sequence[Set[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn ragged rankings into a boolean relevance matrix (padded with False) and the number of
+    positives per problem. Rankings are de-duplicated like the per-problem metrics above.
+    """
+    rankings = [_dedupe_preserve_order(list(ranking)) for ranking in rankings]
+    width = max((len(ranking) for ranking in rankings), default=0)
+    flags = [[ax in pos_set for ax in ranking] for ranking, pos_set in zip(rankings, pos_sets)]
+    relevance = np.zeros((len(rankings), width), dtype=bool)
+    lengths = np.fromiter((len(row) for row in flags), dtype=np.int64, count=len(flags))
+    mask = np.arange(width) < lengths[:, None]
+    relevance[mask] = np.fromiter((flag for row in flags for flag in row), dtype=bool, count=int(lengths.sum()))
+    num_pos = np.fromiter((len(pos_set) for pos_set in pos_sets), dtype=np.int64, count=len(pos_sets))
+    return relevance, num_pos
+
+
+def relevance_from_ranks(positive_ranks: Sequence[Sequence[int]], pool_size: int) -> np.ndarray:
+    """Boolean relevance matrix from the 1-based ranks at which each problem's positives were placed."""
+    counts = np.fromiter((len(ranks) for ranks in positive_ranks), dtype=np.int64, count=len(positive_ranks))
+    rows = np.repeat(np.arange(len(positive_ranks)), counts)
+    columns = np.concatenate([np.asarray(ranks, dtype=np.int64) for ranks in positive_ranks]) - 1 if len(rows) else rows
+    relevance = np.zeros((len(positive_ranks), pool_size), dtype=bool)
+    relevance[rows, columns] = True
+    return relevance
+
+
+def batch_metrics(relevance: np.ndarray, num_pos: np.ndarray, ks: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    Per-problem recall@k, success@k and nDCG@k for every k, plus MRR, nDCG and MAP over the whole
+    ranking, in one pass. num_pos counts every positive, including ones missing from the ranking.
+    Problems without positives score 0 everywhere, as in the per-problem functions.
+    """
+    relevance = np.asarray(relevance, dtype=bool)
+    num_pos = np.asarray(num_pos, dtype=np.int64)
+    n, width = relevance.shape
+    has_pos = num_pos > 0
+    safe_pos = np.maximum(num_pos, 1)
+
+    # Everything below works on the hits only: their row, 0-based rank and 1-based ordinal within the row.
+    rows, ranks = np.nonzero(relevance)
+    per_row = np.bincount(rows, minlength=n)
+    row_start = np.concatenate([[0], np.cumsum(per_row)[:-1]]) if n else per_row
+    ordinals = np.arange(1, len(rows) + 1) - row_start[rows]
+
+    discounts = 1.0 / np.log2(np.arange(2, width + 2))
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])
+    gains = discounts[ranks]
+
+    def per_problem(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(rows, weights=weights, minlength=n)
+
+    def normalised(dcg: np.ndarray, ideal_dcg: np.ndarray) -> np.ndarray:
+        return np.where(has_pos & (ideal_dcg > 0), dcg / np.where(ideal_dcg > 0, ideal_dcg, 1.0), 0.0)
+
+    results: Dict[str, np.ndarray] = {}
+    for k in ks:
+        in_top = ranks < k
+        hits_k = np.bincount(rows[in_top], minlength=n)
+        results[f"recall@{k}"] = np.where(has_pos, hits_k / safe_pos, 0.0)
+        results[f"success@{k}"] = (has_pos & (num_pos <= k) & (hits_k == num_pos)).astype(float)
+        results[f"ndcg@{k}"] = normalised(per_problem(gains * in_top), ideal[np.minimum(num_pos, min(max(k, 0), width))])
+
+    first = ordinals == 1
+    mrr_scores = np.zeros(n)
+    mrr_scores[rows[first]] = 1.0 / (ranks[first] + 1)
+    results["mrr"] = np.where(has_pos, mrr_scores, 0.0)
+    results["ndcg"] = normalised(per_problem(gains), ideal[np.minimum(num_pos, width)])
+    # Average precision: precision at the rank of every hit, over all positives.
+    results["map"] = np.where(has_pos, per_problem(ordinals / (ranks + 1)) / safe_pos, 0.0)
+    return results
+
+
+def summarize(per_problem: Dict[str, np.ndarray], bootstrap: int = 0, confidence: float = 0.95,
+              seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Mean of every batch metric, and with bootstrap > 0 a percentile bootstrap confidence interval
+    from that many resamples of the problems.
+    """
+    summary: Dict[str, Dict[str, float]] = {}
+    rng = np.random.default_rng(seed)
+    names = list(per_problem)
+    n = len(per_problem[names[0]]) if names else 0
+    if bootstrap > 0 and n:
+        values = np.stack([np.asarray(per_problem[name], dtype=np.float32) for name in names])
+        means = np.empty((len(names), bootstrap))
+        chunk = max(1, BOOTSTRAP_CHUNK_VALUES // n)
+        for start in range(0, bootstrap, chunk):
+            size = min(chunk, bootstrap - start)
+            # Each resample as how often it drew every problem, shared by every metric.
+            draws = rng.integers(0, n, size=(size, n), dtype=np.int32)
+            counts = np.stack([np.bincount(row, minlength=n) for row in draws]).astype(np.float32)
+            means[:, start:start + size] = (values @ counts.T) / n
+        alpha = (1.0 - confidence) / 2
+        low, high = np.quantile(means, [alpha, 1.0 - alpha], axis=1)
+    for i, name in enumerate(names):
+        summary[name] = {"mean": float(np.mean(per_problem[name])) if n else 0.0}
+        if bootstrap > 0 and n:
+            summary[name]["ci_low"] = float(low[i])
+            summary[name]["ci_high"] = float(high[i])
+    return summary
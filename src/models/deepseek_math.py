@@ -1,18 +1,38 @@
-from typing import List
+from typing import Dict, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import requests
 import json
+from src.models.score_cache import ScoreCache
 
 # Configurations
 OLLAMA_URL = "http://localhost:11434/api/chat"
 MODEL_NAME = "t1c/deepseek-math-7b-rl:Q6"
+# Requests kept in flight by rerank. Ollama only serves them in parallel up to OLLAMA_NUM_PARALLEL.
+MAX_CONCURRENCY = 4
+# Candidates scored per request in listwise mode (group_size <= 1 means pointwise).
+LISTWISE_GROUP_SIZE = 10
 
 class DeepSeekScorer:
-    def __init__(self, model_name: str = MODEL_NAME):
+    def __init__(self, model_name: str = MODEL_NAME, max_concurrency: int = MAX_CONCURRENCY,
+                 cache: Optional[ScoreCache] = None, group_size: int = 1):
         self.model = model_name
+        self.cache = cache
+        self.group_size = group_size
+        self.max_concurrency = max(1, max_concurrency)
         self.session = requests.Session()
-        # Retry logic for stability
-        adapter = requests.adapters.HTTPAdapter(max_retries=3)
+        # Retry logic for stability, with one pooled connection per in-flight request.
+        adapter = requests.adapters.HTTPAdapter(
+            max_retries=3,
+            pool_connections=1,
+            pool_maxsize=self.max_concurrency,
+        )
         self.session.mount('http://', adapter)
+        self.latencies: List[float] = []
+        # Token usage reported by Ollama, and how often a listwise reply had to be redone pointwise.
+        self.usage: Dict[str, int] = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "listwise_fallbacks": 0}
+        self._latency_lock = threading.Lock()
 
         self.prompt_template = self.prompt_template = """You are a premise-selection reranker for automated theorem proving (TPTP-style formulas).
 Given a Goal (conjecture) and a Candidate Axiom, output a relevance score in [0,1].
@@ -50,9 +70,48 @@ Think step by step, then output ONLY the JSON object (no prose).
 
 Goal: {conj}
 Candidate Axiom: {ax}
+"""
+
+        self.listwise_prompt_template = """You are a premise-selection reranker for automated theorem proving (TPTP-style formulas).
+Given a Goal (conjecture) and a numbered list of Candidate Axioms, output one relevance score in [0,1] per candidate.
+
+Scoring rubric:
+- 1.0 = directly matches key predicates/terms needed by the goal (very likely helpful)
+- 0.7 = strong overlap in predicates/structure; probably helpful
+- 0.3 = weak topical overlap; maybe helpful but generic
+- 0.0 = unrelated symbols/predicates; unlikely helpful
+
+Output MUST be valid JSON matching this schema (no extra keys):
+{{
+  "type": "object",
+  "properties": {{
+    "scores": {{ "type": "array", "items": {{ "type": "number", "minimum": 0.0, "maximum": 1.0 }} }}
+  }},
+  "required": ["scores"]
+}}
+"scores" has exactly one entry per candidate, in the order they are listed.
+
+### Example
+Goal: m2_tsp_1(B,A).
+[1] ( m2_tsp_1(B,A) <=> m1_pre_topc(B,A) ).
+[2] ( v2_membered(A) => v1_membered(A) ).
+Output: {{"scores":[1.0,0.0]}}
+
+### Now score these {count} candidates
+Output ONLY the JSON object (no prose).
+
+Goal: {conj}
+{candidates}
 """
 
     def score(self, conj: str, ax: str) -> float:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ScoreCache.make_key(self.model, self.prompt_template, conj, ax)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         payload = {
             "model": self.model,
             "stream": False,
@@ -71,31 +130,150 @@ Candidate Axiom: {ax}
             }],
         }
 
+        start_time = time.perf_counter()
         try:
             # Reuses the open TCP connection
             response = self.session.post(OLLAMA_URL, json=payload, timeout=60)
             response.raise_for_status()
 
             data = response.json()
+            self._record_usage(data)
             content = json.loads(data["message"]["content"])
 
             # Optional: Print reasoning for debugging
             # print(f"   Reasoning: {content.get('reasoning', '')[:60]}...")
 
-            return float(content["score"])
+            score = float(content["score"])
+            # Only real model answers are cached, never the 0.0 error fallback.
+            if cache_key is not None:
+                self.cache.put(cache_key, score)
+            return score
 
         except Exception as e:
             print(f"\n[Error] Scoring failed: {e}")
             return 0.0
 
+        finally:
+            with self._latency_lock:
+                self.latencies.append(time.perf_counter() - start_time)
+
+    def score_group(self, conj: str, axs: List[str]) -> List[float]:
+        """
+        Listwise scoring: score every axiom in axs against conj with a single request.
+        Cached candidates are not re-sent, and if the reply is malformed (not JSON, wrong
+        length, scores out of range) the uncached candidates are scored pointwise instead.
+        """
+        scores: List[Optional[float]] = [None] * len(axs)
+        cache_keys: List[Optional[bytes]] = [None] * len(axs)
+        if self.cache is not None:
+            for i, ax in enumerate(axs):
+                cache_keys[i] = ScoreCache.make_key(self.model, self.listwise_prompt_template, conj, ax)
+                scores[i] = self.cache.get(cache_keys[i])
+
+        todo = [i for i, score in enumerate(scores) if score is None]
+        if len(todo) == 1:
+            scores[todo[0]] = self.score(conj, axs[todo[0]])
+            return scores
+        if not todo:
+            return scores
+
+        candidates = "\n".join(f"[{n}] {axs[i]}" for n, i in enumerate(todo, 1))
+        payload = {
+            "model": self.model,
+            "stream": False,
+            "options": {"temperature": 0.0},  # Deterministic
+            "format": {
+                "type": "object",
+                "properties": {
+                    "scores": {
+                        "type": "array",
+                        "items": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+                        "minItems": len(todo),
+                        "maxItems": len(todo),
+                    },
+                },
+                "required": ["scores"],
+            },
+            "messages": [{
+                "role": "user",
+                "content": self.listwise_prompt_template.format(conj=conj, count=len(todo), candidates=candidates)
+            }],
+        }
+
+        start_time = time.perf_counter()
+        group_scores: Optional[List[float]] = None
+        try:
+            response = self.session.post(OLLAMA_URL, json=payload, timeout=120)
+            response.raise_for_status()
+
+            data = response.json()
+            self._record_usage(data)
+            content = json.loads(data["message"]["content"])
+            parsed = [float(score) for score in content["scores"]]
+            if len(parsed) == len(todo) and all(0.0 <= score <= 1.0 for score in parsed):
+                group_scores = parsed
+
+        except Exception as e:
+            print(f"\n[Error] Listwise scoring failed: {e}")
+
+        finally:
+            with self._latency_lock:
+                self.latencies.append(time.perf_counter() - start_time)
+
+        if group_scores is None:
+            # Malformed reply: fall back to one pointwise request per candidate.
+            with self._latency_lock:
+                self.usage["listwise_fallbacks"] += 1
+            group_scores = [self.score(conj, axs[i]) for i in todo]
+        elif self.cache is not None:
+            for i, score in zip(todo, group_scores):
+                self.cache.put(cache_keys[i], score)
+
+        for i, score in zip(todo, group_scores):
+            scores[i] = score
+        return scores
+
+    def _record_usage(self, data: Dict) -> None:
+        with self._latency_lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += int(data.get("prompt_eval_count") or 0)
+            self.usage["completion_tokens"] += int(data.get("eval_count") or 0)
+
     def rerank(self, conj:str, candidates:List[str]) -> List[str]:
-        # Score every candidate
-        scored_candidates = []
-        for ax in candidates:
-            score = self.score(conj, ax)
-            scored_candidates.append((ax, score))
+        # Score every candidate, keeping up to max_concurrency requests in flight.
+        # Each score() call still retries and falls back to 0.0 on its own.
+        if self.group_size > 1:
+            groups = [candidates[i:i + self.group_size] for i in range(0, len(candidates), self.group_size)]
+            work, worker = groups, lambda axs: self.score_group(conj, axs)
+        else:
+            work, worker = candidates, lambda ax: self.score(conj, ax)
+
+        if self.max_concurrency == 1 or len(work) <= 1:
+            results = [worker(item) for item in work]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(work))) as executor:
+                results = list(executor.map(worker, work))
+
+        scores = [score for group in results for score in group] if self.group_size > 1 else results
+        scored_candidates = list(zip(candidates, scores))
 
         # Rank by Score (Descending)
         scored_candidates.sort(key=lambda x: x[1], reverse=True)
         ranked_axioms = [ax for ax, s in scored_candidates]
-        return ranked_axioms
\ No newline at end of file
+        return ranked_axioms
+
+    def latency_percentiles(self, percentiles: Sequence[float] = (50, 90, 99)) -> Dict[str, float]:
+        """
+        Per-request latency percentiles (seconds) over every score() call so far.
+        """
+        with self._latency_lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+        result = {}
+        for p in percentiles:
+            # Nearest-rank percentile.
+            rank = max(1, -(-len(latencies) * p // 100))
+            result[f"p{p:g}"] = latencies[int(rank) - 1]
+        result["count"] = len(latencies)
+        return result
\ No newline at end of file
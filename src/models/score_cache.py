@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+from typing import Dict, Optional
+from src.sqlite_cache import SQLiteCache, hash_parts
+
+# Configurations
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+CACHE_FILE = os.path.join(ROOT_DIR, "data", "results", "score_cache.sqlite")
+MAX_ENTRIES = 2_000_000
+# How many inserts between two eviction passes.
+EVICT_EVERY = 1000
+# Hits whose last_used update is buffered in memory before being written in one transaction.
+TOUCH_FLUSH_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    key BLOB PRIMARY KEY,
+    score REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_last_used ON scores(last_used);
+"""
+
+
+class ScoreCache(SQLiteCache):
+    """
+    On-disk cache of reranker scores, shared by every evaluation process on the machine.
+
+    Entries are keyed by a hash of (model name, prompt template, conjecture, axiom), so changing
+    the model or editing the prompt never serves a stale score. Connection handling is shared with
+    the prover cache (src/sqlite_cache.py).
+    Once the table grows past max_entries the least recently used entries are evicted. Lookups
+    stay read-only: the last_used time of a hit is buffered and written in batches (on flush(),
+    stats(), evict() and close()), so read-mostly processes rarely take the WAL write lock.
+    """
+    schema = SCHEMA
+
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = MAX_ENTRIES):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self._inserts = 0
+        self._touched: Dict[bytes, float] = {}
+        self._touch_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, prompt_template: str, conj: str, ax: str) -> bytes:
+        return hash_parts(model, prompt_template, conj, ax)
+
+    def get(self, key: bytes) -> Optional[float]:
+        row = self.conn.execute("SELECT score FROM scores WHERE key = ?", (key,)).fetchone()
+        self._record_lookup(row is not None)
+        if row is None:
+            return None
+        with self._touch_lock:
+            self._touched[key] = time.time()
+            flush = len(self._touched) >= TOUCH_FLUSH_EVERY
+        if flush:
+            self.flush()
+        return row[0]
+
+    def put(self, key: bytes, score: float) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scores (key, score, last_used) VALUES (?, ?, ?)",
+            (key, score, time.time()),
+        )
+        with self._counter_lock:
+            self._inserts += 1
+            evict = self._inserts % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def flush(self) -> None:
+        """Write the buffered last_used times of recent hits."""
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        conn = self.conn
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("UPDATE scores SET last_used = ? WHERE key = ?",
+                             [(last_used, key) for key, last_used in touched.items()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def evict(self) -> int:
+        """Trim the table back to max_entries, dropping the least recently used entries first."""
+        self.flush()
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        return excess
+
+    def stats(self) -> Dict[str, float]:
+        self.flush()
+        return super().stats()
+
+    def close(self):
+        self.flush()
+        super().close()
@@ -0,0 +1,156 @@
+import time
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Items waiting between two stages; a full queue blocks the upstream stage (back-pressure).
+QUEUE_SIZE = 4
+# How often a worker blocked on a queue checks whether the run was stopped.
+POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class _Failed:
+    """Carries an exception from a stage worker to the consumer of Pipeline.run."""
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class Pipeline:
+    """
+    A chain of stages connected by bounded queues, each stage served by its own worker threads.
+
+    Every stage is (name, fn, workers): fn takes the item from the previous stage and returns the
+    item for the next one, or None to drop it. Stages overlap, so item i+1 is in one stage while
+    item i is in the next. run() yields the outputs of the last stage in completion order, and
+    stats() reports per stage how busy its workers were and how deep its input queue got.
+    """
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any], int]], queue_size: int = QUEUE_SIZE):
+        self.stages = [(name, fn, max(1, workers)) for name, fn, workers in stages]
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._busy: Dict[str, float] = {name: 0.0 for name, _, _ in self.stages}
+        self._items: Dict[str, int] = {name: 0 for name, _, _ in self.stages}
+        self._depth_sum: Dict[str, int] = {name: 0 for name, _, _ in self.stages}
+        self._depth_max: Dict[str, int] = {name: 0 for name, _, _ in self.stages}
+        self._elapsed: Optional[float] = None
+        self._stop = threading.Event()
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        """
+        If a stage raises, or the consumer stops iterating, every worker is stopped after its
+        current item and joined before run() returns or re-raises.
+        """
+        self._stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        output: queue.Queue = queue.Queue()
+        start_time = time.perf_counter()
+
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], self.stages[0][2]), daemon=True)]
+        for position, (name, fn, workers) in enumerate(self.stages):
+            last = position == len(self.stages) - 1
+            downstream = output if last else queues[position + 1]
+            downstream_workers = 1 if last else self.stages[position + 1][2]
+            remaining = [workers]
+            for _ in range(workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(name, fn, queues[position], downstream, downstream_workers, remaining),
+                    daemon=True,
+                ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                result = output.get()
+                if result is _DONE:
+                    break
+                if isinstance(result, _Failed):
+                    raise result.exc
+                yield result
+        finally:
+            self._elapsed = time.perf_counter() - start_time
+            # Unblock threads waiting on a full or empty queue so none outlive a failed run.
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _put(self, target: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _feed(self, items: Iterable[Any], first: queue.Queue, workers: int) -> None:
+        try:
+            for item in items:
+                if not self._put(first, item):
+                    return
+        except Exception as e:
+            self._put(first, _Failed(e))
+        for _ in range(workers):
+            self._put(first, _DONE)
+
+    def _work(self, name: str, fn: Callable[[Any], Any], inbox: queue.Queue, outbox: queue.Queue,
+              downstream_workers: int, remaining: List[int]) -> None:
+        while True:
+            depth = inbox.qsize()
+            item = self._get(inbox)
+            if item is _DONE:
+                break
+            if isinstance(item, _Failed):
+                self._put(outbox, item)
+                continue
+
+            start = time.perf_counter()
+            try:
+                result = fn(item)
+            except Exception as e:
+                result = _Failed(e)
+            busy = time.perf_counter() - start
+            with self._lock:
+                self._busy[name] += busy
+                self._items[name] += 1
+                self._depth_sum[name] += depth
+                self._depth_max[name] = max(self._depth_max[name], depth)
+            if result is not None:
+                self._put(outbox, result)
+
+        # The last worker of a stage to finish tells every worker downstream to stop.
+        with self._lock:
+            remaining[0] -= 1
+            last_worker = remaining[0] == 0
+        if last_worker:
+            for _ in range(downstream_workers):
+                self._put(outbox, _DONE)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per stage: items processed, busy seconds, utilisation (busy / (wall time * workers)),
+        and the mean and max depth of its input queue seen when a worker took an item.
+        """
+        elapsed = self._elapsed or 1e-9
+        with self._lock:
+            return {
+                name: {
+                    "items": self._items[name],
+                    "busy_s": self._busy[name],
+                    "utilisation": self._busy[name] / (elapsed * workers),
+                    "mean_queue_depth": self._depth_sum[name] / self._items[name] if self._items[name] else 0.0,
+                    "max_queue_depth": self._depth_max[name],
+                }
+                for name, _, workers in self.stages
+            }
@@ -1,9 +1,17 @@
+import re
 import numpy as np
 
 from pathlib import Path
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Tuple
+from typing import TYPE_CHECKING, List, Set, Tuple
+from src import tptp_parser
+
+if TYPE_CHECKING:
+    from src.tfidf_index import LibraryTfidfIndex
+
+# Function/predicate symbols: TPTP variables start with an upper-case letter, so they are skipped.
+SYMBOL_RE = re.compile(r"(?<![A-Za-z0-9_$])\$?[a-z][A-Za-z0-9_]*")
 
 class PremiseSelector:
     def __init__(self, path: str):
@@ -110,6 +118,77 @@ class PremiseSelector:
 
         return k_premises
 
+    def select_premises_index(self, index: "LibraryTfidfIndex", k: int) -> list[str]:
+        """
+        Like select_premises_tfidf, but ranks against a prefit library-wide index
+        (see src/tfidf_index.py) instead of refitting on this file's axioms.
+        """
+        if len(self.conjecture_text) == 0:
+            self.doc_parse()
+
+        conjecture = " ".join(c[2] for c in self.conjecture_text)
+        return index.select_premises(conjecture, k)
+
+
+def rank_candidates_tfidf(conjecture: str, candidates: List[str]) -> List[str]:
+    """
+    Cheap first-stage ranking: tf-idf fitted on the candidate pool, ordered by cosine similarity
+    to the conjecture (ties keep pool order).
+    """
+    if not candidates:
+        return []
+    vec = TfidfVectorizer(
+        lowercase=True,
+        token_pattern=r"(?u)\b\w+\b",
+        stop_words=None,
+        ngram_range=(1, 1)
+    )
+    try:
+        A = vec.fit_transform(candidates)
+    except ValueError:
+        # Every candidate was empty after tokenisation.
+        return list(candidates)
+    scores = cosine_similarity(vec.transform([conjecture]), A).ravel()
+    order = np.argsort(-scores, kind="stable")
+    return [candidates[i] for i in order]
+
+
+def statement_formula(text: str) -> str:
+    """
+    The formula of a full TPTP statement such as "fof(name, axiom, formula)."; other text is
+    returned unchanged.
+    """
+    masked = tptp_parser.mask_comments(text)
+    header = tptp_parser.TPTP_HEADER_RE.match(masked)
+    if header is None:
+        return text
+    return tptp_parser.extract_tptp_components(header, masked)["formula"]
+
+
+def formula_symbols(formula: str) -> Set[str]:
+    """
+    Function and predicate symbols of a TPTP formula. Given a full statement, only its formula
+    is read, so the "fof", role and statement name do not count as symbols. Interpreted
+    $-symbols such as $i or $true are shared by nearly everything and are dropped.
+    """
+    return {symbol for symbol in SYMBOL_RE.findall(statement_formula(formula)) if not symbol.startswith("$")}
+
+
+def rank_candidates_symbol_overlap(conjecture: str, candidates: List[str]) -> List[str]:
+    """
+    Cheap first-stage ranking: number of conjecture symbols a candidate shares, normalised by
+    the square root of the candidate's own symbol count so huge axioms do not win by size.
+    """
+    conjecture_symbols = formula_symbols(conjecture)
+    scores = []
+    for candidate in candidates:
+        symbols = formula_symbols(candidate)
+        shared = len(symbols & conjecture_symbols)
+        scores.append(shared / np.sqrt(len(symbols)) if symbols else 0.0)
+    order = np.argsort(-np.asarray(scores, dtype=float), kind="stable")
+    return [candidates[i] for i in order]
+
+
 if __name__ == "__main__":
     premise_selector = PremiseSelector("./PUZ001+1.p")
     premises = premise_selector.select_premises_tfidf(k=5)
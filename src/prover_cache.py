@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+from src.sqlite_cache import SQLiteCache, hash_parts
+
+# Configurations
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+CACHE_FILE = os.path.join(ROOT_DIR, "data", "results", "prover_cache.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB NOT NULL,
+    time_limit REAL NOT NULL,
+    decisive INTEGER NOT NULL,
+    runtime REAL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (key, time_limit)
+);
+"""
+
+_binary_digests: Dict[Tuple[str, int, int], str] = {}
+_binary_lock = threading.Lock()
+
+
+def binary_digest(path: str) -> str:
+    """SHA-256 of a prover binary, recomputed only when its size or mtime changes."""
+    stat = os.stat(path)
+    signature = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _binary_lock:
+        digest = _binary_digests.get(signature)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        with _binary_lock:
+            _binary_digests[signature] = digest
+    return digest
+
+
+class ProverCache(SQLiteCache):
+    """
+    On-disk cache of parsed prover results, shared by every process on the machine.
+
+    Entries are keyed by a hash of (prover binary contents, options, problem text); the time
+    limit is stored next to each result rather than in the key. A decisive answer (a proof or a
+    counter-model) is reused for any limit it fits in, but an undecided one (timeout, gave up) is
+    only reused for a limit no longer than the one it was produced under: a run that timed out
+    after 5s says nothing about what 10s would find.
+    """
+    schema = SCHEMA
+
+    def __init__(self, path: str = CACHE_FILE):
+        super().__init__(path)
+
+    @staticmethod
+    def make_key(binary: str, options: Sequence[str], problem_text: str) -> bytes:
+        return hash_parts(binary_digest(binary), *options, "\0", problem_text)
+
+    def get(self, key: bytes, time_limit: float) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT result FROM results WHERE key = ? AND ("
+            " (decisive = 1 AND (time_limit <= ? OR runtime <= ?))"
+            " OR (decisive = 0 AND time_limit >= ?)"
+            ") ORDER BY decisive DESC, time_limit LIMIT 1",
+            (key, time_limit, time_limit, time_limit),
+        ).fetchone()
+        self._record_lookup(row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key: bytes, time_limit: float, result: Dict[str, Any], decisive: bool,
+            runtime: Optional[float] = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (key, time_limit, decisive, runtime, result, created) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, time_limit, int(decisive), runtime, json.dumps(result), time.time()),
+        )
@@ -0,0 +1,171 @@
+import argparse
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+import src.tptp_parser as tptp_parser
+from src.premise_selector import SYMBOL_RE
+from src.tfidf_index import PREMISE_ROLES
+from src.tptp_store import TPTPStore, TPTP_DIR
+
+
+CONJECTURE_ROLES = {"conjecture", "negated_conjecture"}
+TYPE_ROLE = "type"
+DEFAULT_TOLERANCE = 1.0
+
+
+def statement_symbols(formula: str) -> Set[str]:
+    """Function and predicate symbols of a formula. Interpreted $-symbols are too general to trigger anything."""
+    return {symbol for symbol in SYMBOL_RE.findall(formula) if not symbol.startswith("$")}
+
+
+def declared_symbol(formula: str) -> Optional[str]:
+    """The symbol a type declaration such as "f: $i > $o" declares."""
+    match = SYMBOL_RE.search(formula)
+    return match.group(0) if match else None
+
+
+class SineSelector:
+    """
+    SInE premise selection (Hoder & Voronkov) over parsed TPTP statements.
+
+    The inverted index maps every symbol to the axioms it occurs in, so a symbol's occurrence
+    count is the length of its posting list. Symbol s triggers axiom A when s occurs in A and
+    occ(s) <= tolerance * occ(rarest symbol of A). Selection starts from the conjecture symbols
+    and follows triggers transitively, one depth level per round.
+
+    Only statements with a premise role are axioms. Type declarations never trigger; they are
+    added for the symbols the conjecture and the selected axioms use.
+    """
+    def __init__(self, statements: Dict[str, Dict[str, str]]):
+        self.names: List[str] = []
+        self.formulas: List[str] = []
+        self.conjectures: List[str] = []
+        self.axiom_symbols: List[Set[str]] = []
+        self.inverted: Dict[str, List[int]] = defaultdict(list)
+        # Declared symbol -> names of its type declarations.
+        self.declarations: Dict[str, List[str]] = defaultdict(list)
+        self.type_formulas: Dict[str, str] = {}
+        self.type_symbols: Dict[str, Set[str]] = {}
+
+        for name, statement in statements.items():
+            role = statement["role"]
+            if role in CONJECTURE_ROLES:
+                self.conjectures.append(statement["formula"])
+                continue
+            if role == TYPE_ROLE:
+                symbol = declared_symbol(statement["formula"])
+                if symbol is not None:
+                    self.declarations[symbol].append(name)
+                    self.type_formulas[name] = statement["formula"]
+                    self.type_symbols[name] = statement_symbols(statement["formula"])
+                continue
+            if role not in PREMISE_ROLES:
+                continue
+            index = len(self.names)
+            self.names.append(name)
+            self.formulas.append(statement["formula"])
+            symbols = statement_symbols(statement["formula"])
+            self.axiom_symbols.append(symbols)
+            for symbol in symbols:
+                self.inverted[symbol].append(index)
+
+        self._triggers: Dict[float, Dict[str, List[int]]] = {}
+
+    @classmethod
+    def from_file(cls, filepath: str, root_tptp_dir: str = TPTP_DIR, store: Optional[TPTPStore] = None) -> "SineSelector":
+        return cls(tptp_parser.parse_tptp_file(filepath, root_tptp_dir, store=store))
+
+    def occurrences(self, symbol: str) -> int:
+        return len(self.inverted.get(symbol, ()))
+
+    def triggers(self, tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, List[int]]:
+        """Trigger index symbol -> axioms for the given tolerance, built once per tolerance."""
+        triggers = self._triggers.get(tolerance)
+        if triggers is None:
+            triggers = defaultdict(list)
+            for index, symbols in enumerate(self.axiom_symbols):
+                if not symbols:
+                    continue
+                limit = tolerance * min(self.occurrences(symbol) for symbol in symbols)
+                for symbol in symbols:
+                    if self.occurrences(symbol) <= limit:
+                        triggers[symbol].append(index)
+            self._triggers[tolerance] = triggers
+        return triggers
+
+    def type_declarations(self, symbols: Set[str]) -> List[str]:
+        """
+        Names of the type declarations for the given symbols, in file order. The types their
+        signatures mention are declared too.
+        """
+        needed: Set[str] = set()
+        pending = list(symbols)
+        while pending:
+            for name in self.declarations.get(pending.pop(), ()):
+                if name not in needed:
+                    needed.add(name)
+                    pending.extend(self.type_symbols[name])
+        return [name for name in self.type_formulas if name in needed]
+
+    def select(self, conjecture: Optional[str] = None, tolerance: float = DEFAULT_TOLERANCE,
+               depth: Optional[int] = None) -> List[str]:
+        """
+        Names of the type declarations the selection needs, then of the selected axioms in the
+        order they were reached.
+
+        conjecture defaults to the conjecture statements of the parsed problem.
+        depth bounds the number of trigger rounds (None runs to a fixpoint).
+        """
+        if conjecture is None:
+            conjecture = " ".join(self.conjectures)
+        triggers = self.triggers(tolerance)
+
+        seen_symbols = statement_symbols(conjecture)
+        frontier = list(seen_symbols)
+        selected: List[int] = []
+        selected_set: Set[int] = set()
+        level = 0
+        while frontier and (depth is None or level < depth):
+            level += 1
+            next_frontier: List[str] = []
+            for symbol in frontier:
+                for index in triggers.get(symbol, ()):
+                    if index in selected_set:
+                        continue
+                    selected_set.add(index)
+                    selected.append(index)
+                    for new_symbol in self.axiom_symbols[index] - seen_symbols:
+                        seen_symbols.add(new_symbol)
+                        next_frontier.append(new_symbol)
+            frontier = next_frontier
+
+        return self.type_declarations(seen_symbols) + [self.names[index] for index in selected]
+
+    def select_premises(self, conjecture: Optional[str] = None, tolerance: float = DEFAULT_TOLERANCE,
+                        depth: Optional[int] = None) -> List[str]:
+        """Like select, but returns the axiom formulas (as PremiseSelector.select_premises_tfidf does)."""
+        positions = {name: index for index, name in enumerate(self.names)}
+        return [self.type_formulas[name] if name in self.type_formulas else self.formulas[positions[name]]
+                for name in self.select(conjecture, tolerance, depth)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SInE premise selection for a TPTP problem.")
+    parser.add_argument("problem")
+    parser.add_argument("--tptp-dir", default=TPTP_DIR)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--depth", type=int, default=None)
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    selector = SineSelector.from_file(args.problem, args.tptp_dir)
+    parsed = time.perf_counter()
+    selected = selector.select(tolerance=args.tolerance, depth=args.depth)
+    done = time.perf_counter()
+
+    types = sum(name in selector.type_formulas for name in selected)
+    print(f"Selected {len(selected) - types}/{len(selector.names)} axioms and {types} type declarations "
+          f"(parse {parsed - start_time:.3f}s, select {(done - parsed) * 1000:.1f}ms)")
+    for name in selected:
+        print(name)
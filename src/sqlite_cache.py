@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Tuple
+
+
+def hash_parts(*parts: str) -> bytes:
+    """SHA-256 over the parts, each length-prefixed so ("ab", "c") and ("a", "bc") never collide."""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.digest()
+
+
+class SQLiteCache:
+    """
+    Base for the on-disk caches shared by every process on the machine (see src/prover_cache.py
+    and src/models/score_cache.py).
+
+    SQLite in WAL mode handles concurrent readers and writers across processes. Each thread of
+    each process gets its own connection, created with the subclass's schema on first use, and
+    close() closes every connection this process opened. Subclasses count lookups with
+    _record_lookup, which stats() reports.
+    """
+    schema = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        self._connections: List[Tuple[int, sqlite3.Connection]] = []
+        self._connections_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Connections must not cross fork(), so a child process opens its own.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # check_same_thread=False only so close() can close it from another thread;
+            # it is otherwise used by the thread that opened it.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._connections_lock:
+                self._connections.append((os.getpid(), conn))
+        return conn
+
+    def _record_lookup(self, hit: bool) -> None:
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+    def close(self):
+        """Close the connections of every thread in this process; later use reconnects."""
+        pid = os.getpid()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for owner, conn in connections:
+            # A connection inherited through fork() belongs to the parent, leave it alone.
+            if owner == pid:
+                conn.close()
+        self._local = threading.local()
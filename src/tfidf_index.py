@@ -0,0 +1,139 @@
+import os
+import json
+import pickle
+import argparse
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.tptp_store import TPTPStore, STORE_FILE, TPTP_DIR
+
+
+# Filepath Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+INDEX_DIR = os.path.join(ROOT_DIR, "data", "tfidf_index")
+VECTORIZER_FILE = "vectorizer.pkl"
+MATRIX_FILE = "axioms.npz"
+AXIOMS_FILE = "axioms.json"
+# Roles that count as premises when the index is built from the library store.
+PREMISE_ROLES = ("axiom", "hypothesis", "definition", "assumption", "lemma", "theorem", "corollary")
+QUERY_BATCH_SIZE = 1024
+
+
+def store_premises(store: TPTPStore) -> List[Tuple[str, str]]:
+    """(id, formula) of every premise-like statement in the store; ids are "<file>:<name>"."""
+    placeholders = ",".join("?" for _ in PREMISE_ROLES)
+    rows = store.conn.execute(
+        "SELECT files.path, statements.name, statements.formula FROM statements "
+        f"JOIN files ON files.id = statements.file_id WHERE statements.role IN ({placeholders}) "
+        "ORDER BY files.path, statements.seq",
+        PREMISE_ROLES,
+    ).fetchall()
+    return [(f"{path}:{name}", formula) for path, name, formula in rows]
+
+
+class LibraryTfidfIndex:
+    """
+    A tf-idf index fitted once over a whole axiom library.
+
+    The vectorizer and the L2-normalised CSR axiom matrix are persisted, so start-up is a load
+    from disk. Because rows are normalised, cosine similarity for a batch of conjectures is a
+    single sparse product Q @ A.T, and each row's top-k is taken with argpartition.
+    """
+    def __init__(self, vectorizer: TfidfVectorizer, matrix: sp.csr_matrix, ids: List[str], texts: List[str]):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.matrix_t = matrix.T.tocsr()
+        self.ids = ids
+        self.texts = texts
+
+    @classmethod
+    def fit(cls, ids: Sequence[str], texts: Sequence[str]) -> "LibraryTfidfIndex":
+        # Same tokenisation as PremiseSelector.tfidf.
+        vec = TfidfVectorizer(
+            lowercase=True,
+            token_pattern=r"(?u)\b\w+\b",
+            stop_words=None,
+            ngram_range=(1, 1),
+            dtype=np.float32,
+        )
+        matrix = vec.fit_transform(texts).tocsr()
+        return cls(vec, matrix, list(ids), list(texts))
+
+    @classmethod
+    def from_store(cls, store: TPTPStore) -> "LibraryTfidfIndex":
+        """Fit over every premise-like statement in the pre-parsed library store."""
+        premises = store_premises(store)
+        return cls.fit([premise_id for premise_id, _ in premises], [formula for _, formula in premises])
+
+    def save(self, directory: str = INDEX_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, VECTORIZER_FILE), "wb") as f:
+            pickle.dump(self.vectorizer, f)
+        sp.save_npz(os.path.join(directory, MATRIX_FILE), self.matrix)
+        with open(os.path.join(directory, AXIOMS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts}, f)
+
+    @classmethod
+    def load(cls, directory: str = INDEX_DIR) -> "LibraryTfidfIndex":
+        with open(os.path.join(directory, VECTORIZER_FILE), "rb") as f:
+            vectorizer = pickle.load(f)
+        matrix = sp.load_npz(os.path.join(directory, MATRIX_FILE)).tocsr()
+        with open(os.path.join(directory, AXIOMS_FILE), "r", encoding="utf-8") as f:
+            axioms = json.load(f)
+        return cls(vectorizer, matrix, axioms["ids"], axioms["texts"])
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def query(self, conjectures: Iterable[str], k: int,
+              candidates: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k axioms for every conjecture, as (axiom row, cosine score) pairs in descending order.
+        Conjectures are answered QUERY_BATCH_SIZE at a time with one sparse product per batch.
+        candidates optionally restricts the search to the given axiom rows.
+        """
+        matrix_t = self.matrix_t if candidates is None else self.matrix[candidates].T.tocsr()
+        conjectures = list(conjectures)
+        results: List[List[Tuple[int, float]]] = []
+        for start in range(0, len(conjectures), QUERY_BATCH_SIZE):
+            q = self.vectorizer.transform(conjectures[start:start + QUERY_BATCH_SIZE])
+            scores = (q @ matrix_t).tocsr()
+            for row in range(scores.shape[0]):
+                results.append(self._top_k_row(scores, row, k, candidates))
+        return results
+
+    @staticmethod
+    def _top_k_row(scores: sp.csr_matrix, row: int, k: int,
+                   candidates: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        lo, hi = scores.indptr[row], scores.indptr[row + 1]
+        columns, values = scores.indices[lo:hi], scores.data[lo:hi]
+        # Axioms sharing no token with the conjecture score 0 and are not returned.
+        if len(values) > k:
+            top = np.argpartition(-values, k - 1)[:k]
+            columns, values = columns[top], values[top]
+        order = np.argsort(-values, kind="stable")
+        rows = columns[order] if candidates is None else np.asarray(candidates)[columns[order]]
+        return [(int(r), float(v)) for r, v in zip(rows, values[order])]
+
+    def select_premises(self, conjecture: str, k: int) -> List[str]:
+        """Return up to k axiom texts most relevant to the conjecture, like select_premises_tfidf."""
+        return [self.texts[row] for row, _ in self.query([conjecture], k)[0]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit a library-wide tf-idf index over the pre-parsed TPTP store.")
+    parser.add_argument("--db", default=STORE_FILE)
+    parser.add_argument("--tptp-dir", default=TPTP_DIR)
+    parser.add_argument("--out", default=INDEX_DIR)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    index = LibraryTfidfIndex.from_store(TPTPStore(args.db, args.tptp_dir))
+    index.save(args.out)
+    print(f"Indexed {len(index)} axioms ({len(index.vectorizer.vocabulary_)} terms) "
+          f"in {time.time() - start_time:.1f}s -> {args.out}")
@@ -1,7 +1,12 @@
 import os
 import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from src.tptp_store import TPTPStore
 
 
 _ANNOTATED_NAME_RE = r"(?:[a-zA-Z][a-zA-Z0-9_]*|[0-9]+|'(?:\\.|[^'])*'|\$[a-zA-Z][a-zA-Z0-9_]*)"
@@ -18,12 +23,125 @@ INCLUDE_PATTERN = re.compile(
     re.MULTILINE,
 )
 
+# Lexer tokens: backslash runs, quotes and comment openers (mask_comments), and the
+# bracket/comma structure of a statement body (extract_tptp_components).
+_MASK_TOKEN_RE = re.compile(r"\\+|['\"]|%|/\*")
+_STRUCTURE_TOKEN_RE = re.compile(r"\\+|['\"(){}\[\],]")
+_QUOTED_BODY_RE = {
+    "'": re.compile(r"(?:[^'\\]|\\[\s\S])*'"),
+    '"': re.compile(r'(?:[^"\\]|\\[\s\S])*"'),
+}
+_NON_NEWLINE_RE = re.compile(r"[^\n]")
+_STATEMENT_END_RE = re.compile(r"\)\s*\.")
+_BRACKET_OR_COMMA_RE = re.compile(r"[()\[\]{},]")
+_OPENING_BRACKET = {")": "(", "]": "[", "}": "{"}
+_WHITESPACE_RE = re.compile(r"\s*")
+
+# Maximum number of parsed include files kept in memory per process.
+INCLUDE_CACHE_SIZE = 256
+
+
+class IncludeCache:
+    """
+    Thread-safe LRU cache of parsed include files.
+
+    Keys are resolved paths. Values are (statements, files) where statements is the full,
+    unselected result of parsing the include and files maps every file the parse touched
+    (itself and everything it includes, transitively) to its mtime in ns, so editing any of
+    them invalidates the entry.
+    """
+    def __init__(self, max_entries: int = INCLUDE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Dict[str, str]], Dict[str, int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Dict[str, str]], Dict[str, int]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not _mtimes_unchanged(entry[1]):
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, value: Tuple[Dict[str, Dict[str, str]], Dict[str, int]]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max(max_entries, 0):
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+def _mtimes_unchanged(files: Dict[str, int]) -> bool:
+    for path, mtime in files.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return False
+        except FileNotFoundError:
+            return False
+    return True
+
+
+_include_cache = IncludeCache()
+
+
+def configure_include_cache(max_entries: int) -> None:
+    """
+    Set the size bound of the process-wide include cache (0 disables caching).
+    """
+    _include_cache.resize(max_entries)
+
+
+def clear_include_cache() -> None:
+    """
+    Drop every cached include file and reset the hit/miss counters.
+    """
+    _include_cache.clear()
+
+
+def include_cache_info() -> Dict[str, int]:
+    """
+    Return hit/miss counters and current size of the include cache.
+    """
+    return _include_cache.info()
+
 
 def parse_tptp_file(
     filepath: str,
     root_tptp_dir: str,
     loaded_files: Optional[Set[str]] = None,
     selected_statements: Optional[Set[str]] = None,
+    store: Optional["TPTPStore"] = None,
 ) -> Dict[str, Dict[str, str]]:
     """
     Parse a TPTP file and recursively parse all include directives.
@@ -33,14 +151,35 @@ def parse_tptp_file(
         root_tptp_dir: Root directory used for resolving include paths.
         loaded_files: Internal cycle guard for recursive includes.
         selected_statements: Optional whitelist from include(...,[...]).
+        store: Optional pre-parsed library store (src.tptp_store). If it holds an up-to-date
+            copy of the file and everything it includes, the result is read from there.
 
     Returns:
         Mapping from statement name to parsed statement data.
     """
+    if store is not None and loaded_files is None and selected_statements is None:
+        stored_formulas = store.load_statements(filepath)
+        if stored_formulas is not None:
+            return stored_formulas
+
     if loaded_files is None:
         loaded_files = set()
+    return _parse_file(filepath, root_tptp_dir, loaded_files, selected_statements, set())
 
+
+def _parse_file(
+    filepath: str,
+    root_tptp_dir: str,
+    loaded_files: Set[str],
+    selected_statements: Optional[Set[str]],
+    touched: Set[str],
+) -> Dict[str, Dict[str, str]]:
+    """
+    parse_tptp_file without the store lookup. Every file the parse reaches, including ones
+    skipped because they were already loaded, is added to touched.
+    """
     filepath = resolve_path(root_tptp_dir, filepath)
+    touched.add(filepath)
 
     if filepath in loaded_files:
         return {}
@@ -62,16 +201,16 @@ def parse_tptp_file(
     for include_match in INCLUDE_PATTERN.finditer(normalized_content):
         include_path = resolve_path(root_tptp_dir, include_match.group(1), current_file=filepath)
         child_selected_statements = parse_include_selection(include_match.group(2))
-        merged_formulas = parse_tptp_file(
+        merged_formulas = parse_included_file(
             include_path,
             root_tptp_dir,
             loaded_files,
             child_selected_statements,
+            touched,
         )
         all_formulas.update(merged_formulas)
 
-    for header_match in TPTP_HEADER_RE.finditer(normalized_content):
-        parsed_statement = extract_tptp_components(header_match, normalized_content)
+    for parsed_statement in iter_tptp_statements(normalized_content):
         all_formulas[parsed_statement["name"]] = parsed_statement
 
     if selected_statements is not None:
@@ -82,6 +221,47 @@ def parse_tptp_file(
     return all_formulas
 
 
+def parse_included_file(
+    include_path: str,
+    root_tptp_dir: str,
+    loaded_files: Set[str],
+    selected_statements: Optional[Set[str]] = None,
+    touched: Optional[Set[str]] = None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Parse an included file through the process-wide include cache.
+
+    Semantics match an uncached parse with the shared loaded_files set: a file already loaded
+    (by an earlier include or an ancestor in a cycle) contributes nothing, and selections filter
+    the full statement set of the include. A parse only depends on loaded_files through the files
+    it touches, so it is cached only if none of them were loaded beforehand, and a cached entry is
+    only reused under the same condition.
+    The returned statement dicts are shared with the cache and must not be mutated.
+    """
+    if touched is None:
+        touched = set()
+    touched.add(include_path)
+    if include_path in loaded_files:
+        return {}
+
+    entry = _include_cache.get(include_path)
+    if entry is not None and loaded_files.isdisjoint(entry[1]):
+        statements, files = entry
+        loaded_files.update(files)
+        touched.update(files)
+    else:
+        loaded_before = set(loaded_files)
+        reached: Set[str] = set()
+        statements = _parse_file(include_path, root_tptp_dir, loaded_files, None, reached)
+        touched.update(reached)
+        if loaded_before.isdisjoint(reached):
+            _include_cache.put(include_path, (statements, {path: os.stat(path).st_mtime_ns for path in reached}))
+
+    if selected_statements is None:
+        return dict(statements)
+    return {name: statement for name, statement in statements.items() if name in selected_statements}
+
+
 def parse_include_selection(raw_selection: Optional[str]) -> Optional[Set[str]]:
     """
     Parse selector list from include('file',[a,b,'c,d']).
@@ -141,80 +321,61 @@ def split_top_level_commas(raw_value: str) -> List[str]:
 def mask_comments(content: str) -> str:
     """
     Mask line and block comments with spaces while preserving string length and line breaks.
+
+    Plain text, identifiers and quoted strings are skipped by the regex engine; the Python loop
+    only runs once per backslash run, quote or comment.
     """
-    chars = list(content)
+    pieces: List[str] = []
+    copied_up_to = 0
     index = 0
-    current_quote: Optional[str] = None
-    in_line_comment = False
-    in_block_comment = False
-    backslash_run = 0
-
-    while index < len(chars):
-        char = chars[index]
-        next_char = chars[index + 1] if index + 1 < len(chars) else ""
-        escaped = backslash_run % 2 == 1
-
-        if in_line_comment:
-            if char == "\n":
-                in_line_comment = False
-            else:
-                chars[index] = " "
-            backslash_run = 0
-            index += 1
-            continue
-
-        if in_block_comment:
-            if char == "*" and next_char == "/":
-                chars[index] = " "
-                chars[index + 1] = " "
-                in_block_comment = False
-                backslash_run = 0
-                index += 2
-                continue
-            if char != "\n":
-                chars[index] = " "
-            backslash_run = 0
-            index += 1
-            continue
+    length = len(content)
 
-        if current_quote:
-            if char == current_quote and not escaped:
-                current_quote = None
-            backslash_run = backslash_run + 1 if char == "\\" else 0
-            index += 1
-            continue
+    while True:
+        token = _MASK_TOKEN_RE.search(content, index)
+        if token is None:
+            break
+        start, end = token.span()
+        lexeme = token.group()
 
-        if char in ("'", '"') and not escaped:
-            current_quote = char
-            backslash_run = 0
-            index += 1
+        if lexeme[0] == "\\":
+            index = _skip_backslash_run(content, start, end)
             continue
 
-        if char == "%":
-            chars[index] = " "
-            in_line_comment = True
-            backslash_run = 0
-            index += 1
+        if lexeme in ("'", '"'):
+            index = _skip_quoted(content, start)
             continue
 
-        if char == "/" and next_char == "*":
-            chars[index] = " "
-            chars[index + 1] = " "
-            in_block_comment = True
-            backslash_run = 0
-            index += 2
-            continue
+        if lexeme == "%":
+            comment_end = content.find("\n", start)
+            if comment_end == -1:
+                comment_end = length
+            pieces.append(content[copied_up_to:start])
+            pieces.append(" " * (comment_end - start))
+        else:
+            comment_end = content.find("*/", end)
+            comment_end = length if comment_end == -1 else comment_end + 2
+            pieces.append(content[copied_up_to:start])
+            pieces.append(_NON_NEWLINE_RE.sub(" ", content[start:comment_end]))
 
-        backslash_run = backslash_run + 1 if char == "\\" else 0
-        index += 1
+        copied_up_to = index = comment_end
 
-    return "".join(chars)
+    if copied_up_to == 0:
+        return content
+    pieces.append(content[copied_up_to:])
+    return "".join(pieces)
 
 
 def extract_tptp_components(match: re.Match, content: str) -> Dict[str, str]:
     """
     Extract statement components from normalized content (with comments masked).
     """
+    return _extract_statement(match, content)[0]
+
+
+def _extract_statement(match: re.Match, content: str) -> Tuple[Dict[str, str], int]:
+    """
+    Extract statement components and return them with the index just past the statement's final ".".
+    """
     tptp_type = match.group(1)
     name = match.group(2)
     role = match.group(3)
@@ -223,45 +384,50 @@ def extract_tptp_components(match: re.Match, content: str) -> Dict[str, str]:
     formula_end: Optional[int] = None
     statement_close_idx: Optional[int] = None
 
+    # Fast path: most statements are a well-nested formula followed by ")." with no quotes and no
+    # annotations. A bracket-matching pass over the body proves that, and then the candidate ")"
+    # is the first root-level one. Anything else falls through to the token loop.
+    statement_close_idx = _find_plain_statement_close(content, formula_start)
+    if statement_close_idx is not None:
+        formula_end = statement_close_idx
+
     open_parens = 0
     open_square_brackets = 0
     open_curly_braces = 0
-    current_quote: Optional[str] = None
-    backslash_run = 0
 
-    index = formula_start
-    while index < len(content):
-        char = content[index]
-        escaped = backslash_run % 2 == 1
+    index = formula_start if statement_close_idx is None else statement_close_idx
+    while statement_close_idx is None:
+        token = _STRUCTURE_TOKEN_RE.search(content, index)
+        if token is None:
+            index = len(content)
+            break
+        start, end = token.span()
+        char = token.group()
 
-        if current_quote:
-            if char == current_quote and not escaped:
-                current_quote = None
-            backslash_run = backslash_run + 1 if char == "\\" else 0
-            index += 1
+        if char[0] == "\\":
+            index = _skip_backslash_run(content, start, end)
             continue
 
-        if char in ("'", '"') and not escaped:
-            current_quote = char
-            backslash_run = 0
-            index += 1
+        if char in ("'", '"'):
+            index = _skip_quoted(content, start)
             continue
 
+        index = end
         at_root = open_parens == 0 and open_square_brackets == 0 and open_curly_braces == 0
 
-        if formula_end is None and char == "," and at_root:
-            formula_end = index
-
-        if char == ")" and at_root:
-            statement_close_idx = index
-            if formula_end is None:
-                formula_end = index
-            break
-
-        if char == "(":
+        if char == ",":
+            if formula_end is None and at_root:
+                formula_end = start
+        elif char == ")":
+            if at_root:
+                index = statement_close_idx = start
+                if formula_end is None:
+                    formula_end = start
+                break
+            if open_parens > 0:
+                open_parens -= 1
+        elif char == "(":
             open_parens += 1
-        elif char == ")" and open_parens > 0:
-            open_parens -= 1
         elif char == "[":
             open_square_brackets += 1
         elif char == "]" and open_square_brackets > 0:
@@ -271,9 +437,6 @@ def extract_tptp_components(match: re.Match, content: str) -> Dict[str, str]:
         elif char == "}" and open_curly_braces > 0:
             open_curly_braces -= 1
 
-        backslash_run = backslash_run + 1 if char == "\\" else 0
-        index += 1
-
     if formula_end is None:
         formula_end = index
 
@@ -281,23 +444,90 @@ def extract_tptp_components(match: re.Match, content: str) -> Dict[str, str]:
         statement_close_idx = index
 
     statement_end = statement_close_idx
-    while statement_end + 1 < len(content) and content[statement_end + 1].isspace():
-        statement_end += 1
-    if statement_end + 1 < len(content) and content[statement_end + 1] == ".":
-        statement_end += 1
+    if statement_end < len(content):
+        after_space = _WHITESPACE_RE.match(content, statement_end + 1).end()
+        statement_end = after_space - 1
+        if after_space < len(content) and content[after_space] == ".":
+            statement_end = after_space
 
     formula = content[formula_start:formula_end].strip()
     full_statement = content[match.start():statement_end + 1].strip()
     if not full_statement.endswith("."):
         full_statement += "."
 
-    return {
+    statement = {
         "type": tptp_type,
         "name": name,
         "role": role,
         "formula": formula,
         "full_statement": full_statement,
     }
+    return statement, min(statement_end + 1, len(content))
+
+
+def iter_tptp_statements(normalized_content: str) -> Iterator[Dict[str, str]]:
+    """
+    Split normalized content (with comments masked) into statement dicts in one forward pass.
+    """
+    for header_match in TPTP_HEADER_RE.finditer(normalized_content):
+        yield extract_tptp_components(header_match, normalized_content)
+
+
+def iter_tptp_statement_spans(normalized_content: str) -> Iterator[Tuple[int, int, Dict[str, str]]]:
+    """
+    Like iter_tptp_statements, but also yield the [start, end) character span of each statement.
+    """
+    for header_match in TPTP_HEADER_RE.finditer(normalized_content):
+        statement, end = _extract_statement(header_match, normalized_content)
+        yield header_match.start(1), end, statement
+
+
+def _find_plain_statement_close(content: str, formula_start: int) -> Optional[int]:
+    """
+    Return the index of the statement-closing ")" if the formula body is quote-free, well-nested
+    and has no root-level comma; otherwise None.
+    """
+    end_match = _STATEMENT_END_RE.search(content, formula_start)
+    if end_match is None:
+        return None
+
+    body = content[formula_start:end_match.start()]
+    if "'" in body or '"' in body or "\\" in body:
+        return None
+
+    # One pass over the brackets and commas with a stack of open brackets: linear in the body
+    # length whatever the nesting depth.
+    open_brackets: List[str] = []
+    for token in _BRACKET_OR_COMMA_RE.findall(body):
+        if token in _OPENING_BRACKET:
+            if not open_brackets or open_brackets.pop() != _OPENING_BRACKET[token]:
+                return None
+        elif token == ",":
+            if not open_brackets:
+                return None
+        else:
+            open_brackets.append(token)
+
+    if open_brackets:
+        return None
+    return end_match.start()
+
+
+def _skip_backslash_run(content: str, start: int, end: int) -> int:
+    """
+    Return the index after a backslash run, also consuming a quote it escapes (odd-length run).
+    """
+    if (end - start) % 2 == 1 and end < len(content) and content[end] in ("'", '"'):
+        return end + 1
+    return end
+
+
+def _skip_quoted(content: str, start: int) -> int:
+    """
+    Return the index after the quoted string opened at start (end of content if unterminated).
+    """
+    body = _QUOTED_BODY_RE[content[start]].match(content, start + 1)
+    return body.end() if body is not None else len(content)
 
 
 def resolve_path(root_tptp_dir: str, path: str, current_file: Optional[str] = None) -> str:
@@ -0,0 +1,266 @@
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import src.tptp_parser as tptp_parser
+
+
+# Filepath Constants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPT_DIR)
+TPTP_DIR = os.path.join(ROOT_DIR, "data", "TPTP-v9.2.1")
+STORE_FILE = os.path.join(ROOT_DIR, "data", "tptp_store.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS statements (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    role TEXT NOT NULL,
+    formula TEXT NOT NULL,
+    full_statement TEXT NOT NULL,
+    start_byte INTEGER NOT NULL,
+    end_byte INTEGER NOT NULL,
+    PRIMARY KEY (file_id, seq)
+);
+CREATE TABLE IF NOT EXISTS includes (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    target_path TEXT NOT NULL,
+    selection TEXT,
+    PRIMARY KEY (file_id, seq)
+);
+CREATE INDEX IF NOT EXISTS statements_by_name ON statements(name);
+CREATE INDEX IF NOT EXISTS includes_by_target ON includes(target_path);
+"""
+
+
+class TPTPStore:
+    """
+    On-disk SQLite store of pre-parsed TPTP files.
+
+    Every file keeps its own statements (with byte offsets into the raw file) and its include
+    directives, so a problem's full transitive statement set is answered with a few indexed
+    lookups instead of re-reading and re-parsing the library.
+    Paths inside root_tptp_dir are stored relative to it.
+    """
+    def __init__(self, db_path: str = STORE_FILE, root_tptp_dir: str = TPTP_DIR):
+        self.db_path = db_path
+        self.root_tptp_dir = os.path.realpath(root_tptp_dir)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # A connection must not cross fork(), so every process opens its own.
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def _key(self, path: str) -> str:
+        path = os.path.realpath(path)
+        if path.startswith(self.root_tptp_dir + os.sep):
+            return os.path.relpath(path, self.root_tptp_dir)
+        return path
+
+    def _abspath(self, key: str) -> str:
+        return key if os.path.isabs(key) else os.path.join(self.root_tptp_dir, key)
+
+    def index_file(self, filepath: str) -> bool:
+        """
+        Parse one file (without following includes) into the store.
+        Returns False if it was already stored with the same mtime and size.
+        """
+        filepath = tptp_parser.resolve_path(self.root_tptp_dir, filepath)
+        stat = os.stat(filepath)
+        key = self._key(filepath)
+
+        row = self.conn.execute("SELECT id, mtime_ns, size FROM files WHERE path = ?", (key,)).fetchone()
+        if row is not None and row[1] == stat.st_mtime_ns and row[2] == stat.st_size:
+            return False
+
+        with open(filepath, "r", encoding="utf-8") as file_handle:
+            raw_content = file_handle.read()
+        normalized_content = tptp_parser.mask_comments(raw_content)
+
+        includes: List[Tuple[str, Optional[str]]] = []
+        for include_match in tptp_parser.INCLUDE_PATTERN.finditer(normalized_content):
+            include_path = tptp_parser.resolve_path(self.root_tptp_dir, include_match.group(1), current_file=filepath)
+            selection = tptp_parser.parse_include_selection(include_match.group(2))
+            includes.append((self._key(include_path), json.dumps(sorted(selection)) if selection is not None else None))
+
+        to_byte = _byte_offset_mapper(raw_content)
+        statements = [
+            (seq, st["name"], st["type"], st["role"], st["formula"], st["full_statement"], to_byte(start), to_byte(end))
+            for seq, (start, end, st) in enumerate(tptp_parser.iter_tptp_statement_spans(normalized_content))
+        ]
+
+        with self.conn:
+            if row is not None:
+                self.conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+            file_id = self.conn.execute(
+                "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+                (key, stat.st_mtime_ns, stat.st_size),
+            ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO statements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(file_id,) + statement for statement in statements],
+            )
+            self.conn.executemany(
+                "INSERT INTO includes VALUES (?, ?, ?, ?)",
+                [(file_id, seq, target, selection) for seq, (target, selection) in enumerate(includes)],
+            )
+        return True
+
+    def index_tree(self, patterns: Tuple[str, ...] = ("Axioms/**/*.ax", "Problems/**/*.p")) -> Dict[str, int]:
+        """
+        Index (or incrementally re-index) every matching file under root_tptp_dir.
+        """
+        counts = {"indexed": 0, "unchanged": 0, "failed": 0}
+        for pattern in patterns:
+            for path in glob.iglob(os.path.join(self.root_tptp_dir, pattern), recursive=True):
+                try:
+                    counts["indexed" if self.index_file(path) else "unchanged"] += 1
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"-> Error indexing {path}: {e}")
+                    counts["failed"] += 1
+        return counts
+
+    def _file_row(self, key: str) -> Optional[Tuple[int, int, int]]:
+        return self.conn.execute("SELECT id, mtime_ns, size FROM files WHERE path = ?", (key,)).fetchone()
+
+    def _is_fresh(self, key: str, row: Tuple[int, int, int]) -> bool:
+        try:
+            stat = os.stat(self._abspath(key))
+        except FileNotFoundError:
+            return False
+        return row[1] == stat.st_mtime_ns and row[2] == stat.st_size
+
+    def load_statements(self, filepath: str) -> Optional[Dict[str, Dict[str, str]]]:
+        """
+        Return the same mapping as tptp_parser.parse_tptp_file, answered from the store.
+        Returns None if the file or anything it includes is missing from the store or has changed on disk.
+        """
+        filepath = tptp_parser.resolve_path(self.root_tptp_dir, filepath)
+        return self._load(self._key(filepath), set(), None)
+
+    def _load(self, key: str, loaded_files: Set[str], selected_statements: Optional[Set[str]]) -> Optional[Dict[str, Dict[str, str]]]:
+        if key in loaded_files:
+            return {}
+        loaded_files.add(key)
+
+        row = self._file_row(key)
+        if row is None or not self._is_fresh(key, row):
+            return None
+
+        all_formulas: Dict[str, Dict[str, str]] = {}
+        includes = self.conn.execute(
+            "SELECT target_path, selection FROM includes WHERE file_id = ? ORDER BY seq", (row[0],)
+        ).fetchall()
+        for target_path, selection in includes:
+            child_selected_statements = set(json.loads(selection)) if selection is not None else None
+            merged_formulas = self._load(target_path, loaded_files, child_selected_statements)
+            if merged_formulas is None:
+                return None
+            all_formulas.update(merged_formulas)
+
+        statements = self.conn.execute(
+            "SELECT type, name, role, formula, full_statement FROM statements WHERE file_id = ? ORDER BY seq",
+            (row[0],),
+        )
+        for tptp_type, name, role, formula, full_statement in statements:
+            all_formulas[name] = {
+                "type": tptp_type,
+                "name": name,
+                "role": role,
+                "formula": formula,
+                "full_statement": full_statement,
+            }
+
+        if selected_statements is not None:
+            all_formulas = {
+                name: statement for name, statement in all_formulas.items() if name in selected_statements
+            }
+        return all_formulas
+
+    def locate(self, name: str) -> Iterator[Tuple[str, int, int]]:
+        """
+        Yield (source file, start byte, end byte) for every stored statement with the given name.
+        """
+        rows = self.conn.execute(
+            "SELECT files.path, start_byte, end_byte FROM statements JOIN files ON files.id = statements.file_id "
+            "WHERE name = ?",
+            (name,),
+        )
+        for path, start, end in rows:
+            yield self._abspath(path), start, end
+
+    def includers(self, filepath: str) -> List[str]:
+        """
+        Return every stored file that directly includes filepath (the reverse include graph).
+        """
+        rows = self.conn.execute(
+            "SELECT files.path FROM includes JOIN files ON files.id = includes.file_id WHERE target_path = ?",
+            (self._key(tptp_parser.resolve_path(self.root_tptp_dir, filepath)),),
+        )
+        return [self._abspath(path) for (path,) in rows]
+
+
+def _byte_offset_mapper(raw_content: str):
+    """
+    Return a function mapping character offsets in raw_content to UTF-8 byte offsets.
+    """
+    if raw_content.isascii():
+        return lambda char_offset: char_offset
+
+    byte_offsets = [0]
+    for char in raw_content:
+        byte_offsets.append(byte_offsets[-1] + len(char.encode("utf-8")))
+    return lambda char_offset: byte_offsets[char_offset]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-parse the TPTP library into an SQLite store.")
+    parser.add_argument("command", choices=["index", "query"])
+    parser.add_argument("problem", nargs="?", help="Problem file to look up (query only).")
+    parser.add_argument("--tptp-dir", default=TPTP_DIR)
+    parser.add_argument("--db", default=STORE_FILE)
+    args = parser.parse_args()
+
+    store = TPTPStore(args.db, args.tptp_dir)
+
+    if args.command == "index":
+        start_time = time.time()
+        counts = store.index_tree()
+        print(f"Indexed {counts['indexed']} files ({counts['unchanged']} unchanged, {counts['failed']} failed) "
+              f"in {time.time() - start_time:.1f}s -> {args.db}")
+    else:
+        start_time = time.time()
+        statements = store.load_statements(args.problem)
+        elapsed_ms = (time.time() - start_time) * 1000
+        if statements is None:
+            print(f"{args.problem} is missing or stale in the store, run the index command first.")
+        else:
+            print(f"Found {len(statements)} statements in {elapsed_ms:.1f}ms.")
+
+    store.close()